@@ -0,0 +1,31 @@
+from django.db.models import Q
+
+
+def prefix_range(field, prefix):
+    """Условие «field начинается с prefix» в виде диапазона.
+
+    Сравнения >= и < SQLite выполняет по индексу поля, тогда как
+    LIKE с регистронезависимым сравнением читает всю таблицу.
+    """
+    following = prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 0x10FFFF))
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': following})
+
+
+class PrefixSearchMixin:
+    """Поиск в админке по началу значений search_fields.
+
+    Обслуживает и строку поиска списка, и автодополнение в формах.
+    Сравнение учитывает регистр, поэтому запрос проверяется как есть,
+    строчными буквами и с заглавной первой буквой. Поля из
+    search_fields должны быть проиндексированы.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for variant in {term, term.lower(), term.capitalize()}:
+            for field in self.search_fields:
+                condition |= prefix_range(field, variant)
+        return queryset.filter(condition), False
@@ -0,0 +1,239 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Общий кэш процессов WSGI без отдельного сервера.
+
+    Данные лежат в файле SQLite в режиме WAL: чтения не блокируют друг
+    друга и запись, поэтому все воркеры хоста видят одни и те же
+    значения и сбросы версий. Ключи живут до истечения TTL, при
+    превышении MAX_ENTRIES вытесняется 1/CULL_FREQUENCY записей, к
+    которым дольше всего не обращались (LRU).
+
+    Options:
+        TOUCH_INTERVAL: как часто, в секундах, обновлять время
+            обращения к ключу при чтении; реже — меньше записей.
+        CULL_EVERY: раз во сколько записей проверять MAX_ENTRIES.
+        TIMEOUT_BUSY: сколько секунд ждать блокировку записи.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self._cull_every = int(options.get('CULL_EVERY', 64))
+        self._busy_timeout = float(options.get('TIMEOUT_BUSY', 5))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и пересоздаётся после fork().
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return sqlite3.Binary(pickle.dumps(value, self.pickle_protocol))
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        return {
+            key: value
+            for key, (value, _) in self.get_many_with_expiry(
+                keys, version
+            ).items()
+        }
+
+    def get_many_with_expiry(self, keys, version=None):
+        """Как get_many, но значения — пары (значение, срок).
+
+        Срок — момент истечения по time.time() или None для вечных
+        ключей: по нему TieredCache ограничивает жизнь копии в L1.
+        """
+        if not keys:
+            return {}
+        names = {self._key(key, version): key for key in keys}
+        now = time.time()
+        rows = self._connection.execute(
+            'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({",".join("?" * len(names))})',
+            list(names),
+        ).fetchall()
+        found, expired, stale = {}, [], []
+        for name, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append(name)
+                continue
+            found[names[name]] = pickle.loads(value), expires
+            if now - accessed > self._touch_interval:
+                stale.append(name)
+        if expired or stale:
+            with self._write() as connection:
+                connection.executemany(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    [(name, now) for name in expired],
+                )
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(now, name) for name in stale],
+                )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self._key(key, version), self._dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+            )
+            self._maybe_cull(connection, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        name = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (name, now),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)',
+                (name, self._dumps(value),
+                 self.get_backend_timeout(timeout), now),
+            ).rowcount == 1
+            if added:
+                self._maybe_cull(connection, 1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), time.time(),
+                 self._key(key, version), time.time()),
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (name, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), name),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        names = [(self._key(key, version),) for key in keys]
+        if names:
+            with self._write() as connection:
+                connection.executemany(
+                    'DELETE FROM cache WHERE key = ?', names
+                )
+
+    def has_key(self, key, version=None):
+        return self._connection.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение держится между запросами, как у LocMemCache.
+        pass
+
+    def _maybe_cull(self, connection, written):
+        self._writes += written
+        if self._writes < self._cull_every:
+            return
+        self._writes = 0
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+        else:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?'
+                ')',
+                (count // self._cull_frequency or 1,),
+            )
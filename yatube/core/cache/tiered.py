@@ -0,0 +1,200 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BUS_KEY: str = 'tiered-bus'
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU в памяти воркера (L1) перед общим L2.
+
+    Горячие ключи (версии лент, фрагменты, группы) читаются из L1 без
+    обращения к L2. Перезапись, удаление и incr публикуются в шину
+    внутри L2: счётчик событий и журнал изменённых ключей. Первая
+    запись ключа (set или add ключа, которого нет в L2) не публикуется:
+    копий в L1 других воркеров у него нет. Воркер сверяет счётчик не
+    чаще раза в POLL_INTERVAL секунд и выбрасывает из L1 ключи,
+    изменённые в других процессах; при пропуске событий L1 очищается
+    целиком.
+
+    Копия в L1 живёт не дольше L1_TIMEOUT и не дольше ключа в L2.
+    Срок ключа, прочитанного из L2, берётся из get_many_with_expiry,
+    если L2 его поддерживает (SQLiteCache).
+
+    Options:
+        L2: алиас общего кэша из settings.CACHES.
+        MAX_ENTRIES: размер L1.
+        L1_TIMEOUT: сколько секунд ключ может жить в L1.
+        POLL_INTERVAL: как часто проверять шину.
+        BUS_TIMEOUT: сколько секунд хранятся записи журнала шины.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', location)
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._poll_interval = float(options.get('POLL_INTERVAL', 0.5))
+        self._bus_timeout = int(options.get('BUS_TIMEOUT', 300))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen = None
+        self._polled = 0
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._poll()
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                name = self.make_key(key, version)
+                entry = self._l1.get(name)
+                if entry is None or entry[1] <= now:
+                    missing.append(key)
+                    continue
+                self._l1.move_to_end(name)
+                found[key] = pickle.loads(entry[0])
+        if missing:
+            for key, (value, expires) in self._fetch(missing, version):
+                self._remember(self.make_key(key, version), value, expires)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # Атомарный add отличает первую запись от перезаписи: публиковать
+        # нужно только перезаписанные ключи.
+        overwritten = {
+            key: value for key, value in data.items()
+            if not self.l2.add(key, value, timeout, version=version)
+        }
+        failed = []
+        if overwritten:
+            failed = self.l2.set_many(overwritten, timeout, version=version)
+            self._publish(
+                [self.make_key(key, version) for key in overwritten]
+            )
+        expires = self.l2.get_backend_timeout(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self.make_key(key, version), value, expires)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self.make_key(key, version), value,
+                           self.l2.get_backend_timeout(timeout))
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._publish([self.make_key(key, version)])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget([self.make_key(key, version)])
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version=version)
+        self._publish([self.make_key(key, version) for key in keys])
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self.l2.clear()
+        self._drop_l1()
+        self._seen = None
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def _fetch(self, keys, version):
+        """Пары (ключ, (значение, срок)) из L2; срок по time.time()."""
+        get_many = getattr(self.l2, 'get_many_with_expiry', None)
+        if get_many is not None:
+            return get_many(keys, version=version).items()
+        # Срок неизвестен: копию ограничивает только L1_TIMEOUT.
+        fetched = self.l2.get_many(keys, version=version)
+        return ((key, (value, None)) for key, value in fetched.items())
+
+    def _remember(self, key, value, expires):
+        """Кладёт value в L1 не дольше L1_TIMEOUT и срока expires."""
+        ttl = self._l1_timeout
+        if expires is not None:
+            ttl = min(ttl, expires - time.time())
+        if ttl <= 0:
+            return
+        entry = (pickle.dumps(value, self.pickle_protocol),
+                 time.monotonic() + ttl)
+        with self._lock:
+            self._l1[key] = entry
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _publish(self, keys):
+        """Сообщает остальным воркерам об изменении ключей."""
+        if not keys:
+            return
+        self._forget(keys)
+        try:
+            event = self.l2.incr(BUS_KEY)
+        except ValueError:
+            self.l2.add(BUS_KEY, 0, None)
+            event = self.l2.incr(BUS_KEY)
+        self.l2.set(f'{BUS_KEY}:{event}', keys, self._bus_timeout)
+        if self._seen == event - 1:
+            self._seen = event
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._polled < self._poll_interval:
+            return
+        self._polled = now
+        current = self.l2.get(BUS_KEY, 0)
+        seen, self._seen = self._seen, current
+        if seen == current:
+            return
+        if (seen is None or seen > current
+                or current - seen > self._max_entries):
+            # Журнал шины неполон или сброшен: доверять L1 нельзя.
+            self._drop_l1()
+            return
+        events = [
+            f'{BUS_KEY}:{event}' for event in range(seen + 1, current + 1)
+        ]
+        log = self.l2.get_many(events)
+        if len(log) != len(events):
+            self._drop_l1()
+            return
+        self._forget(key for keys in log.values() for key in keys)
+
+    def _drop_l1(self):
+        with self._lock:
+            self._l1.clear()
@@ -0,0 +1,57 @@
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку кэш-бэкендов при попадании и записи.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument(
+            '--size', type=int, default=8192,
+            help='Размер значения в байтах (фрагмент страницы).',
+        )
+
+    def handle(self, *args, **options):
+        value = 'x' * options['size']
+        keys = [f'bench:{number}' for number in range(options['keys'])]
+        self.stdout.write(
+            f'{"backend":>14} {"hit, us":>9} {"miss, us":>9} {"set, us":>9}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'LocMemCache': LocMemCache('bench', {}),
+                'FileBasedCache': FileBasedCache(directory + '/files', {}),
+                'SQLiteCache': SQLiteCache(directory + '/cache.sqlite3', {}),
+            }
+            for name, cache in backends.items():
+                cache._max_entries = len(keys) * 2
+                sets = self.measure(
+                    lambda key: cache.set(key, value), keys, 1
+                )
+                hits = self.measure(cache.get, keys, options['rounds'])
+                misses = self.measure(
+                    cache.get, [f'{key}:miss' for key in keys],
+                    options['rounds'],
+                )
+                self.stdout.write(
+                    f'{name:>14} {hits:>9.1f} {misses:>9.1f} {sets:>9.1f}'
+                )
+
+    def measure(self, operation, keys, rounds):
+        """Медиана времени одной операции в микросекундах."""
+        timings = []
+        for _ in range(rounds):
+            for key in keys:
+                started = time.perf_counter()
+                operation(key)
+                timings.append((time.perf_counter() - started) * 1e6)
+        return statistics.median(timings)
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.parsers import parse_geometry
+
+ENGINES = (
+    'sorl.thumbnail.engines.pil_engine.Engine',
+    'core.thumbnail.engines.DraftEngine',
+)
+
+# Размеры снимков телефона (12 Мп) и зеркальной камеры (24 Мп)
+SYNTHETIC_SIZES = ((4032, 3024), (6000, 4000))
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def measure(engine_path, path, geometry, options, rounds):
+    """Время и пиковая память одной миниатюры в отдельном процессе.
+
+    Вызывается в свежем дочернем процессе: его пиковый RSS считается
+    с момента fork(), поэтому прирост относится только к этой
+    картинке и этому движку.
+    """
+    engine = import_string(engine_path)()
+    with open(path, 'rb') as file:
+        raw = file.read()
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        image = Image.open(BytesIO(raw))
+        ratio = image.size[0] / image.size[1]
+        thumbnail = engine.create(
+            image, parse_geometry(geometry, ratio), options
+        )
+        thumbnail.load()
+        timings.append((time.perf_counter() - started) * 1000)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return statistics.median(timings), (peak_rss - start_rss) / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время и память создания миниатюры стандартным '
+        'движком sorl и DraftEngine на фото реального размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Фото или каталоги с фото; без них снимки создаются '
+                 'синтетически.',
+        )
+        parser.add_argument('--geometry', default='960x339')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        options_ = dict(
+            default.backend.default_options, crop='center', upscale=True
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            paths = self.corpus(options['paths']) or self.synthetic(directory)
+            self.stdout.write(
+                f'{"photo":>24} {"engine":>12} {"ms":>8} {"peak, MB":>9}'
+            )
+            context = multiprocessing.get_context('fork')
+            for path in paths:
+                for engine_path in ENGINES:
+                    with context.Pool(1) as pool:
+                        elapsed, peak = pool.apply(measure, (
+                            engine_path, path, options['geometry'],
+                            options_, options['rounds'],
+                        ))
+                    name = os.path.basename(path)[-24:]
+                    engine = engine_path.rsplit('.', 1)[-1]
+                    self.stdout.write(
+                        f'{name:>24} {engine:>12} {elapsed:>8.1f} '
+                        f'{peak:>9.1f}'
+                    )
+
+    def corpus(self, paths):
+        found = []
+        for path in paths:
+            if os.path.isdir(path):
+                found.extend(
+                    os.path.join(path, name)
+                    for name in sorted(os.listdir(path))
+                    if name.lower().endswith(EXTENSIONS)
+                )
+            elif os.path.isfile(path):
+                found.append(path)
+            else:
+                raise CommandError(f'Нет такого файла: {path}')
+        return found
+
+    def synthetic(self, directory):
+        """Снимки с шумом: он не сжимается, как детали настоящего фото."""
+        paths = []
+        for width, height in SYNTHETIC_SIZES:
+            noise = Image.effect_noise((width, height), 48)
+            gradient = Image.linear_gradient('L').resize((width, height))
+            image = Image.merge('RGB', (noise, gradient, noise))
+            path = os.path.join(directory, f'photo_{width}x{height}.jpg')
+            image.save(path, 'JPEG', quality=90)
+            paths.append(path)
+        return paths
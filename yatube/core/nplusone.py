@@ -0,0 +1,142 @@
+import logging
+import random
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Списки IN (%s, %s, ...) разной длины — запросы одного вида.
+IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+
+DESCRIPTORS_MODULE = 'django.db.models.fields.related_descriptors'
+
+DEFERRED_MODULE = 'django.db.models.query_utils'
+
+
+class NPlusOneError(AssertionError):
+    """Страница повторяет один и тот же запрос для каждой строки."""
+
+
+class Detector:
+    """Собирает запросы по виду и месту, откуда они вызваны.
+
+    Вид запроса — его SQL без параметров; место — строка шаблона,
+    который его вызвал, и связь модели (post.author) или отложенное
+    поле, чьё чтение его породило. Запросы, вызванные не из шаблона
+    и не обращением к атрибуту, не учитываются: их повторы видны в
+    коде представления. Не меньше threshold одинаковых запросов из
+    одного места — это N+1.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.queries = Counter()
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        template, relation = _origin()
+        if template or relation:
+            self.queries[IN_LIST.sub('(...)', sql), template, relation] += 1
+        return execute(sql, params, many, context)
+
+    def reports(self):
+        """Описания найденных N+1, самые частые первыми."""
+        return [
+            f'{count} запросов из {template or "кода"}'
+            f'{f" через {relation}" if relation else ""}: {sql}'
+            for (sql, template, relation), count in self.queries.most_common()
+            if count >= self.threshold
+        ]
+
+
+@contextmanager
+def no_n_plus_one(threshold=None):
+    """Поднимает NPlusOneError, если код в блоке сделал N+1 запросов.
+
+    with no_n_plus_one():
+        self.client.get(url)
+    """
+    with Detector(threshold) as detector:
+        yield detector
+    reports = detector.reports()
+    if reports:
+        raise NPlusOneError('\n'.join(reports))
+
+
+class NPlusOneMiddleware:
+    """Ищет N+1 запросы в страницах.
+
+    NPLUSONE_MODE = 'raise' (в разработке) превращает находку в
+    ошибку, 'log' пишет предупреждение с именем представления, None
+    выключает проверку. В бою проверяется лишь доля запросов
+    NPLUSONE_SAMPLE_RATE: обход стека на каждый SQL-запрос не
+    бесплатен.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.NPLUSONE_MODE
+        if not mode or random.random() >= settings.NPLUSONE_SAMPLE_RATE:
+            return self.get_response(request)
+        with Detector() as detector:
+            response = self.get_response(request)
+        reports = detector.reports()
+        if reports:
+            match = request.resolver_match
+            view = match.view_name if match else request.path
+            message = f'N+1 в {view}:\n' + '\n'.join(reports)
+            if mode == 'raise':
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+
+def _origin():
+    """Строка шаблона и связь модели, которые вызвали запрос."""
+    template = relation = None
+    frame = sys._getframe(2)
+    while frame is not None and not (template and relation):
+        module = frame.f_globals.get('__name__', '')
+        name = frame.f_code.co_name
+        node = frame.f_locals.get('self')
+        if template is None and name == 'render_annotated' and (
+            module == 'django.template.base'
+        ):
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        elif relation is None and name == '__get__' and (
+            module in (DESCRIPTORS_MODULE, DEFERRED_MODULE)
+        ):
+            relation = _relation(node, frame.f_locals.get('instance'))
+        frame = frame.f_back
+    return template, relation
+
+
+def _relation(descriptor, instance):
+    """«Модель.поле» для дескриптора связи или отложенного поля."""
+    field = getattr(descriptor, 'field', None)
+    if field is None and hasattr(descriptor, 'related'):
+        field = descriptor.related.remote_field
+    if field is not None:
+        return f'{field.model.__name__}.{field.name}'
+    name = getattr(descriptor, 'field_name', None)
+    if name is not None and instance is not None:
+        return f'{type(instance).__name__}.{name}'
+    return None
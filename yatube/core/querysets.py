@@ -0,0 +1,60 @@
+import logging
+import sys
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query import ModelIterable
+
+logger = logging.getLogger(__name__)
+
+
+class QuerySetInTemplateError(AssertionError):
+    """Шаблон вычислил queryset без среза."""
+
+
+class TemplateGuardedQuerySet(models.QuerySet):
+    """QuerySet, который сообщает, если шаблон вычислил его целиком.
+
+    {% if posts %} или {% for post in posts %} по queryset без среза
+    загружают всю таблицу ради одной проверки. Проверяется только
+    вычисление тегом или фильтром шаблона. С настройкой
+    TEMPLATE_QUERYSET_GUARD = 'log' такое вычисление попадает в лог,
+    с 'raise' — поднимает QuerySetInTemplateError; с None проверки
+    нет. Срезы, count() и exists() не проверяются.
+    """
+
+    def _fetch_all(self):
+        if self._result_cache is None and settings.TEMPLATE_QUERYSET_GUARD:
+            self._check_template_evaluation()
+        super()._fetch_all()
+
+    def _check_template_evaluation(self):
+        if not self.query.can_filter():
+            return
+        if self._iterable_class is not ModelIterable:
+            return
+        if not _rendering_template():
+            return
+        message = (
+            f'Шаблон вычислил весь queryset {self.model.__name__} '
+            f'без среза: {self.query}'
+        )
+        if settings.TEMPLATE_QUERYSET_GUARD == 'raise':
+            raise QuerySetInTemplateError(message)
+        logger.warning(message, stack_info=True)
+
+
+def _rendering_template():
+    """Вычисляет ли queryset сам шаблон Django.
+
+    Смотрится первый вызывающий код за пределами QuerySet: тег или
+    фильтр шаблона, а не, например, виджет формы, который шаблон
+    отрисовывает.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module not in (__name__, 'django.db.models.query'):
+            return module.startswith('django.template.')
+        frame = frame.f_back
+    return False
@@ -1,6 +1,31 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
 from http import HTTPStatus
+from io import BytesIO, StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts import feeds
+from posts.models import Comment, Post, User
+
+from .cache.sqlite import SQLiteCache
+from .cache.tiered import TieredCache
+from .nplusone import NPlusOneError, no_n_plus_one
+from .querysets import QuerySetInTemplateError
+from .thumbnail import resize
+from .thumbnail.engines import DraftEngine
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +36,403 @@ class ViewTestClass(TestCase):
             HTTPStatus.NOT_FOUND,
         )
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def set_in_child(location, key, value):
+    SQLiteCache(location, {}).set(key, value)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """set/get/add/incr/delete работают как у встроенных бэкендов."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 1))
+        self.assertEqual(self.cache.incr('new', 5), 6)
+        self.assertEqual(
+            self.cache.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 6},
+        )
+        self.cache.delete_many(['key', 'new'])
+        self.assertIsNone(self.cache.get('key'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_ttl(self):
+        """Просроченные ключи не возвращаются и освобождают add."""
+        self.cache.set('key', 'value', timeout=0.05)
+        self.assertTrue(self.cache.has_key('key'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'again'))
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=4, CULL_FREQUENCY=2, CULL_EVERY=1, TOUCH_INTERVAL=0
+        )
+        for number in range(4):
+            cache.set(f'key{number}', number)
+            time.sleep(0.01)
+        cache.get('key0')
+        cache.get('key1')
+        cache.set('key4', 4)
+        self.assertEqual(
+            sorted(cache.get_many([f'key{n}' for n in range(5)])),
+            ['key0', 'key1', 'key4'],
+        )
+
+    def test_shared_between_processes(self):
+        """Значение, записанное другим процессом, видно сразу."""
+        self.cache.get('warm-up')
+        process = multiprocessing.get_context('fork').Process(
+            target=set_in_child, args=(self.location, 'shared', 42)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('shared'), 42)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        # Два экземпляра с общим L2 изображают два воркера.
+        self.first = self.make_cache()
+        self.second = self.make_cache()
+        self.first.clear()
+
+    def make_cache(self, **options):
+        options = {'L2': 'shared', 'POLL_INTERVAL': 0, **options}
+        return TieredCache('', {'OPTIONS': options})
+
+    def test_reads_are_served_from_l1(self):
+        """Повторное чтение не обращается к L2."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.l2.delete('key')
+        self.assertEqual(self.second.get('key'), 'value')
+
+    def test_changes_invalidate_other_workers(self):
+        """set/delete/incr одного воркера сбрасывают L1 другого."""
+        self.first.set('key', 'old')
+        self.first.set('counter', 1)
+        self.assertEqual(self.second.get_many(['key', 'counter']),
+                         {'key': 'old', 'counter': 1})
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.incr('counter')
+        self.assertEqual(self.second.get('counter'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_first_fill_is_not_published(self):
+        """Шина получает только перезапись, удаление и incr."""
+        self.first.set('key', 'value')
+        self.assertTrue(self.first.add('other', 1))
+        self.assertFalse(self.first.add('other', 2))
+        self.assertIsNone(self.first.l2.get('tiered-bus'))
+        self.assertEqual(self.second.get_many(['key', 'other']),
+                         {'key': 'value', 'other': 1})
+
+        self.first.set('key', 'new')
+        self.first.incr('other')
+        self.first.delete('key')
+        self.assertEqual(self.first.l2.get('tiered-bus'), 3)
+        self.assertEqual(self.second.get_many(['key', 'other']),
+                         {'other': 2})
+
+    def test_l1_does_not_outlive_l2(self):
+        """Копия в L1 истекает вместе с ключом в L2."""
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {
+                'BACKEND': 'core.cache.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }
+            with override_settings(CACHES={'shared': shared}):
+                cache = self.make_cache()
+                cache.l2.set('read', 'value', timeout=0.1)
+                cache.set('written', 'value', timeout=0.1)
+                self.assertEqual(cache.get_many(['read', 'written']),
+                                 {'read': 'value', 'written': 'value'})
+                time.sleep(0.15)
+                self.assertEqual(cache.get_many(['read', 'written']), {})
+
+    def test_lost_bus_log_drops_l1(self):
+        """Если журнал шины потерян, L1 очищается целиком."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.first.l2.clear()
+        self.first.l2.set('key', 'new')
+        self.first.l2.set('tiered-bus', 10)
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_l1_is_bounded(self):
+        """L1 хранит не больше MAX_ENTRIES последних ключей."""
+        cache = self.make_cache(MAX_ENTRIES=2)
+        cache.get('warm-up')
+        for number in range(3):
+            cache.set(f'key{number}', number)
+        cache.l2.delete_many(['key0', 'key1', 'key2'])
+        self.assertEqual(cache.get_many(['key0', 'key1', 'key2']),
+                         {'key1': 1, 'key2': 2})
+
+
+class DraftEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = DraftEngine()
+        self.options = dict(
+            default.backend.default_options, crop='center', upscale=True
+        )
+
+    def open(self, size, format='JPEG'):
+        buffer = BytesIO()
+        Image.new('RGB', size, (10, 120, 200)).save(buffer, format)
+        buffer.seek(0)
+        return Image.open(buffer)
+
+    def test_large_jpeg_is_decoded_reduced(self):
+        """JPEG декодируется в масштабе не меньше DRAFT_GAP целевого."""
+        image = self.open((4000, 3000))
+        geometry = parse_geometry('960x339')
+        self.assertEqual(
+            self.engine.draft(image, geometry, self.options), (2000, 1500)
+        )
+        thumbnail = self.engine.create(
+            self.open((4000, 3000)), geometry, self.options
+        )
+        self.assertEqual(thumbnail.size, (960, 339))
+
+    def test_other_images_are_decoded_whole(self):
+        geometry = parse_geometry('960x339')
+        for image in (self.open((4000, 3000), 'PNG'), self.open((300, 200))):
+            with self.subTest(format=image.format, size=image.size):
+                size = image.size
+                self.assertEqual(
+                    self.engine.draft(image, geometry, self.options), size
+                )
+
+    def test_benchmark_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'photo.jpg')
+            Image.new('RGB', (1600, 1200)).save(path, 'JPEG')
+            out = StringIO()
+            call_command('bench_thumbnails', path, '--rounds', '1',
+                         stdout=out)
+        self.assertIn('DraftEngine', out.getvalue())
+        self.assertIn('photo.jpg', out.getvalue())
+
+
+class DiskCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = resize.DiskCache(self.directory, 1300)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_least_recently_read_files_are_evicted(self):
+        for number, key in enumerate(('aa1', 'bb2', 'cc3')):
+            path = self.cache.set(key, b'x' * 400)
+            os.utime(path, (number, number))
+        # Чтение освежает файл: вытесняется следующий по давности.
+        self.cache.get('aa1')
+        self.cache.set('dd4', b'x' * 400)
+        kept = [key for key in ('aa1', 'bb2', 'cc3', 'dd4')
+                if self.cache.get(key)]
+        self.assertEqual(kept, ['aa1', 'dd4'])
+
+
+class ResizeViewTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            MEDIA_ROOT=self.directory,
+            RESIZE_CACHE_DIR=os.path.join(self.directory, 'resize'),
+        )
+        self.settings.enable()
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), (10, 120, 200)).save(buffer, 'JPEG')
+        self.name = default_storage.save(
+            'posts/photo.jpg', ContentFile(buffer.getvalue())
+        )
+        self.spec = ('320x113', {'crop': 'center', 'upscale': True})
+        self.url = resize.url(self.name, *self.spec)
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_signed_url_is_resized_once(self):
+        with mock.patch.object(resize, '_resize',
+                               wraps=resize._resize) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        for response in (first, second):
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            self.assertNotIn('immutable', response['Cache-Control'])
+            with Image.open(BytesIO(b''.join(response.streaming_content))) \
+                    as image:
+                self.assertEqual(image.size, (320, 113))
+        self.assertEqual(
+            resize.output_size((1200, 800), *self.spec), (320, 113)
+        )
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_regenerated_copy_changes_etag(self):
+        """Пересозданная под тем же адресом копия получает новый ETag."""
+        etag = self.client.get(self.url)['ETag']
+        buffer = BytesIO()
+        Image.new('RGB', (320, 113), (200, 10, 10)).save(buffer, 'JPEG')
+        with mock.patch.object(resize, '_resize',
+                               return_value=buffer.getvalue()):
+            resize.render(self.name, resize.encode(*self.spec), force=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            b''.join(response.streaming_content), buffer.getvalue()
+        )
+
+    def test_unsigned_geometry_is_rejected(self):
+        signature = self.url.split('/')[2]
+        forged = f'/resize/{signature}/4000x4000,jpeg/{self.name}'
+        self.assertEqual(self.client.get(forged).status_code,
+                         HTTPStatus.FORBIDDEN)
+
+    def test_missing_source(self):
+        url = resize.url('posts/none.jpg', *self.spec)
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.NOT_FOUND)
+
+
+class TemplateQuerySetGuardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+
+    def render(self, source, posts):
+        return Template(source).render(Context({'posts': posts}))
+
+    @override_settings(TEMPLATE_QUERYSET_GUARD='raise')
+    def test_unsliced_queryset_in_template(self):
+        with self.assertRaises(QuerySetInTemplateError):
+            self.render('{% if posts %}есть{% endif %}', Post.objects.all())
+
+    @override_settings(TEMPLATE_QUERYSET_GUARD='raise')
+    def test_cheap_evaluations_are_allowed(self):
+        posts = Post.objects.order_by('-pk')
+        self.assertEqual(
+            self.render('{% for post in posts %}{{ post }}{% endfor %}',
+                        posts[:1]),
+            'Пост',
+        )
+        self.assertEqual(
+            self.render('{{ posts.exists }} {{ posts.count }}', posts),
+            'True 1',
+        )
+        # Вне шаблона вычислять queryset целиком можно.
+        self.assertEqual(len(posts), 1)
+
+    @override_settings(TEMPLATE_QUERYSET_GUARD='log')
+    def test_log_mode(self):
+        with self.assertLogs('core.querysets', 'WARNING'):
+            output = self.render('{% if posts %}есть{% endif %}',
+                                 Post.objects.all())
+        self.assertEqual(output, 'есть')
+
+
+class NPlusOneTests(TestCase):
+    TEMPLATE = ('{% for post in posts %}\n'
+                '{{ post.author.username }}{% endfor %}')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for index in range(3):
+            author = User.objects.create_user(username=f'author-{index}')
+            cls.post = Post.objects.create(text=f'Пост {index}', author=author)
+            Comment.objects.create(post=cls.post, author=author, text='Да')
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def render(self, posts):
+        return Template(self.TEMPLATE).render(Context({'posts': posts}))
+
+    def test_lazy_relation_in_template(self):
+        with self.assertRaises(NPlusOneError) as context:
+            with no_n_plus_one():
+                self.render(list(Post.objects.all()))
+        message = str(context.exception)
+        self.assertIn('3 запросов', message)
+        self.assertIn(':2', message)
+        self.assertIn('Post.author', message)
+
+    def test_lazy_relation_in_code(self):
+        with self.assertRaisesMessage(NPlusOneError, 'Post.text'):
+            with no_n_plus_one():
+                for post in Post.objects.only('pk'):
+                    post.text
+
+    def test_joined_relation_passes(self):
+        with no_n_plus_one() as detector:
+            self.render(list(Post.objects.select_related('author')))
+        self.assertEqual(detector.reports(), [])
+
+    def lazy_comments(self):
+        """Комментарии без автора, загружаемого JOIN."""
+        return mock.patch.object(
+            feeds, 'comments', lambda post: Comment.objects.all()
+        )
+
+    @override_settings(NPLUSONE_MODE='log', NPLUSONE_SAMPLE_RATE=1.0)
+    def test_middleware_logs_view(self):
+        with self.lazy_comments():
+            with self.assertLogs('core.nplusone', 'WARNING') as logs:
+                response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        message = logs.output[0]
+        self.assertIn('posts:post_detail', message)
+        self.assertIn('includes/comment.html', message)
+        self.assertIn('Comment.author', message)
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_SAMPLE_RATE=1.0)
+    def test_middleware_raises(self):
+        with self.lazy_comments():
+            with self.assertRaises(NPlusOneError):
+                self.client.get(self.url)
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_SAMPLE_RATE=0.0)
+    def test_middleware_samples(self):
+        with self.lazy_comments():
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,72 @@
+from math import ceil
+
+from PIL import Image
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+from sorl.thumbnail.helpers import toint
+
+
+def scaling_factor(size, geometry, crop):
+    """Во сколько раз движок sorl изменит картинку size под geometry.
+
+    С кадрированием картинка накрывает рамку целиком, без него
+    вписывается в неё.
+    """
+    factors = (geometry[0] / size[0], geometry[1] / size[1])
+    return max(factors) if crop else min(factors)
+
+
+class DraftEngine(PILEngine):
+    """Движок sorl, который не декодирует JPEG в полном размере.
+
+    Стандартный движок распаковывает фото целиком и уменьшает его
+    одним resize(). Здесь до первого обращения к пикселям декодеру
+    JPEG через Image.draft() заказывается масштаб 1/2, 1/4 или 1/8 —
+    в памяти оказывается в 4–64 раза меньше точек, а обратное DCT
+    считается быстрее. Draft останавливается на размере не меньше
+    DRAFT_GAP целевых, остаток уменьшения делает resize() с
+    Lanczos, который сначала сжимает картинку reduce() до
+    REDUCING_GAP целевых (так же поступает Image.thumbnail).
+    Движок переопределяет только публичные методы sorl.
+    """
+
+    DRAFT_GAP = 2.0
+    REDUCING_GAP = 3.0
+
+    def create(self, image, geometry, options):
+        self.draft(image, geometry, options)
+        return super().create(image, geometry, options)
+
+    def draft(self, image, geometry, options):
+        """Заказывает декодеру JPEG уменьшенный масштаб.
+
+        Возвращает размер, в котором будет декодировано изображение.
+        """
+        if image.format != 'JPEG' or options.get('cropbox'):
+            return image.size
+        flipped = self.flip_dimensions(image)
+        x_image, y_image = image.size
+        if flipped:
+            x_image, y_image = y_image, x_image
+        factor = scaling_factor(
+            (x_image, y_image), geometry, options['crop']
+        ) * self.DRAFT_GAP
+        if factor >= 1:
+            return image.size
+        width, height = ceil(x_image * factor), ceil(y_image * factor)
+        if flipped:
+            width, height = height, width
+        image.draft(image.mode, (width, height))
+        return image.size
+
+    def scale(self, image, geometry, options):
+        """Масштабирует как движок sorl, но через reduce() и Lanczos."""
+        x_image, y_image = map(float, self.get_image_size(image))
+        if self.flip_dimensions(image):
+            x_image, y_image = y_image, x_image
+        factor = scaling_factor((x_image, y_image), geometry, options['crop'])
+        if factor < 1 or options['upscale']:
+            image = image.resize(
+                (toint(x_image * factor), toint(y_image * factor)),
+                resample=Image.LANCZOS, reducing_gap=self.REDUCING_GAP,
+            )
+        return image
@@ -0,0 +1,43 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Пауза между попытками взять занятую аренду, с
+POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def lease(key):
+    """Аренда key в общем кэше: работу под ней делает один процесс.
+
+    Кто первым взял аренду, тот и работает; остальные процессы ждут
+    её освобождения не дольше THUMBNAIL_LEASE_WAIT секунд и затем
+    находят готовый результат. Если ждать пришлось дольше, блок
+    выполняется без аренды: страница не остаётся без картинки.
+    Аренда истекает через THUMBNAIL_LEASE_TIMEOUT секунд, даже если
+    её владелец упал. Отдаёт True, если аренда взята.
+    """
+    acquired = _acquire(key)
+    if not acquired:
+        logger.warning('Не дождались аренды %s, работаем без неё', key)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def _acquire(key):
+    """Берёт аренду, дожидаясь её освобождения; False по таймауту."""
+    deadline = time.monotonic() + settings.THUMBNAIL_LEASE_WAIT
+    while not cache.add(key, os.getpid(), settings.THUMBNAIL_LEASE_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+    return True
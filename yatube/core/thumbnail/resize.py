@@ -0,0 +1,259 @@
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from sorl.thumbnail import default
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import ThumbnailParseError, parse_geometry
+
+from .engines import scaling_factor
+from .lease import lease
+
+SALT = 'core.thumbnail.resize'
+
+LEASE_PREFIX = 'resize-lease'
+
+# Флаги спецификации и опции sorl, которые они задают
+FLAGS = {
+    'crop': ('crop', 'center'),
+    'upscale': ('upscale', True),
+}
+
+FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# Порция чтения копии при подсчёте ETag
+CHUNK_SIZE = 64 * 1024
+
+# При вытеснении кэш ужимается до этой доли RESIZE_CACHE_MAX_BYTES
+CULL_TO = 0.9
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def encode(geometry, options):
+    """Спецификация для адреса: «960x339,crop,upscale,jpeg».
+
+    Поддерживаются только опции из FLAGS и формат, остальные опции
+    sorl адресом не передаются.
+    """
+    options = dict(options)
+    parts = [geometry]
+    for flag, (option, value) in FLAGS.items():
+        if options.pop(option, None) == value:
+            parts.append(flag)
+    format_ = options.pop('format', 'JPEG')
+    if options or format_ not in FORMATS:
+        raise ValueError(f'Опции нельзя передать адресом: {options}')
+    parts.append(format_.lower())
+    return ','.join(parts)
+
+
+def decode(spec):
+    """Геометрия и опции sorl из спецификации; ValueError, если она
+    записана неверно."""
+    geometry, *flags, format_ = spec.split(',')
+    if format_.upper() not in FORMATS:
+        raise ValueError(f'Неизвестный формат: {format_}')
+    try:
+        parse_geometry(geometry)
+    except ThumbnailParseError as error:
+        raise ValueError(str(error)) from error
+    # Без флага upscale копия не увеличивается, хотя по умолчанию
+    # sorl увеличивает (THUMBNAIL_UPSCALE): так считает и output_size.
+    options = {'format': format_.upper(), 'upscale': False}
+    for flag in flags:
+        if flag not in FLAGS:
+            raise ValueError(f'Неизвестный флаг: {flag}')
+        option, value = FLAGS[flag]
+        options[option] = value
+    return geometry, options
+
+
+def signature(spec, name):
+    return signing.Signer(salt=SALT).signature(f'{spec}/{name}')
+
+
+def verify(value, spec, name):
+    return constant_time_compare(value, signature(spec, name))
+
+
+def url(name, geometry, options):
+    """Подписанный адрес уменьшенной копии изображения name.
+
+    Шаблону достаточно адреса: картинку строит представление resize
+    при первом запросе.
+    """
+    spec = encode(geometry, options)
+    return reverse('resize', args=(signature(spec, name), spec, name))
+
+
+def output_size(source_size, geometry, options):
+    """Размер картинки, которую вернёт resize, без чтения исходника.
+
+    Повторяет расчёт движка sorl. Если размеры исходника неизвестны,
+    точный ответ есть только для кадрирования с увеличением, иначе
+    None.
+    """
+    crop, upscale = options.get('crop'), options.get('upscale')
+    if not source_size:
+        width, height = parse_geometry(geometry)
+        if crop and upscale and width and height:
+            return width, height
+        return None
+    x_image, y_image = source_size
+    width, height = parse_geometry(geometry, x_image / y_image)
+    factor = scaling_factor(source_size, (width, height), crop)
+    if factor >= 1 and not upscale:
+        factor = 1
+    size = toint(x_image * factor), toint(y_image * factor)
+    if crop:
+        size = min(size[0], width), min(size[1], height)
+    return size
+
+
+def render(name, spec, force=False):
+    """Путь к уменьшенной копии name из дискового кэша.
+
+    При промахе копия строится движком sorl под арендой, чтобы
+    одну и ту же картинку не считали несколько воркеров сразу.
+    Если исходника нет, поднимается OSError.
+    """
+    key = cache_key(name, spec)
+    cache = disk_cache()
+    path = None if force else cache.get(key)
+    if path is None:
+        with lease(f'{LEASE_PREFIX}:{key}'):
+            path = None if force else cache.get(key)
+            if path is None:
+                path = cache.set(key, _resize(name, *decode(spec)))
+    return path
+
+
+def cache_key(name, spec):
+    """Ключ копии в дисковом кэше; он же — имя её аренды."""
+    return hashlib.sha256(f'{spec}/{name}'.encode()).hexdigest()
+
+
+def digest(file):
+    """Хэш содержимого копии для ETag; файл читается с начала и
+    возвращается к началу."""
+    file.seek(0)
+    value = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        value.update(chunk)
+    file.seek(0)
+    return value.hexdigest()[:32]
+
+
+def _resize(name, geometry, options):
+    engine = default.engine
+    options = dict(default.backend.default_options, **options)
+    image = engine.get_image(ImageFile(name, default.storage))
+    options['image_info'] = engine.get_image_info(image)
+    ratio = engine.get_image_ratio(image, options)
+    image = engine.create(image, parse_geometry(geometry, ratio), options)
+    buffer = BytesIO()
+    engine.write(image, options, buffer)
+    return buffer.getvalue()
+
+
+def disk_cache():
+    """Дисковый кэш из настроек, общий для потоков процесса."""
+    directory = settings.RESIZE_CACHE_DIR
+    max_bytes = settings.RESIZE_CACHE_MAX_BYTES
+    with _caches_lock:
+        if (directory, max_bytes) not in _caches:
+            _caches[directory, max_bytes] = DiskCache(directory, max_bytes)
+        return _caches[directory, max_bytes]
+
+
+class DiskCache:
+    """Файлы уменьшенных копий с вытеснением давно не читанных (LRU).
+
+    Время последнего чтения — mtime файла: попадание обновляет его.
+    Объём каталога процесс считает сам и пересчитывает обходом, когда
+    оценка превысила max_bytes; тогда же удаляются самые старые
+    файлы. Файлы пишутся во временный и переименовываются, поэтому
+    читатели других процессов не видят их недописанными.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix='.'
+        )
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._size = self.cull(int(self.max_bytes * CULL_TO))
+        return path
+
+    def cull(self, target):
+        """Удаляет давно не читанные файлы, пока объём больше target.
+
+        Возвращает оставшийся объём.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        size = sum(entry[2] for entry in entries)
+        for path, _, length in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= length
+        return size
+
+    def _scan_size(self):
+        return sum(entry[2] for entry in self._entries())
+
+    def _entries(self):
+        """Тройки (путь, mtime, размер) всех файлов кэша."""
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
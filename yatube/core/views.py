@@ -1,6 +1,13 @@
 from typing import Any, Dict
 
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from PIL import Image
+
+from .thumbnail import resize as resizer
 
 
 def page_not_found(request, exception):
@@ -26,3 +33,37 @@ def server_error(request):
 def permission_denied(request, exception):
     template = 'core/403.html'
     return render(request, template, status=403)
+
+
+def resize(request, signature, spec, name):
+    """Уменьшенная копия изображения по подписанному адресу.
+
+    Адреса строит resizer.url; чужие геометрии отклоняются, чтобы
+    нельзя было заставить сервер считать произвольные размеры.
+    Копия строится при первом запросе и дальше отдаётся с диска.
+    Адрес не меняется, когда копию пересоздают (regenerate_thumbnails
+    --force, другой движок или качество), поэтому ETag считается
+    по содержимому, а браузер перепроверяет копию по истечении
+    RESIZE_MAX_AGE.
+    """
+    if not resizer.verify(signature, spec, name):
+        return HttpResponseForbidden()
+    try:
+        _, options = resizer.decode(spec)
+        path = resizer.render(name, spec)
+        file = open(path, 'rb')
+    except (OSError, ValueError):
+        raise Http404
+    etag = quote_etag(resizer.digest(file))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(
+            file, content_type=Image.MIME[options['format']]
+        )
+    else:
+        file.close()
+    response['ETag'] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.RESIZE_MAX_AGE,
+    )
+    return response
@@ -1,17 +1,39 @@
 from django.contrib import admin
 
+from core.admin import PrefixSearchMixin
+
+from . import search
+from .forms import PostChangeListForm
 from .models import Post, Group, Comment, Follow
+from .paginators import EstimatedCountPaginator
+
+
+class ScalableChangeListMixin:
+    """Список объектов, который не замедляется с ростом таблицы.
+
+    Attributes:
+        paginator: оценка числа строк вместо COUNT(*) по всей таблице.
+        show_full_result_count: без второго COUNT(*) при фильтрации.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     """Конфигурация отображения данных.
 
     Attributes:
         list_display: отображаемые поля.
+        list_select_related: автор и группа подгружаются одним запросом.
         list_editable: изменение поле group в любом посте.
         search_fields: интерфейс для поиска по тексту постов.
         list_filter: возможность фильтрации по дате.
+        date_hierarchy: переход по датам по индексу pub_date.
+        autocomplete_fields: автор и группа выбираются поиском.
+        ordering: новые посты первыми; автодополнение постов листает
+            упорядоченный queryset.
     """
 
     list_display = (
@@ -21,19 +43,40 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    ordering = ('-pk',)
     empty_value_display = '-пусто-'
 
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту идёт через индекс FTS5, а не LIKE '%…%'."""
+        expression = search.match_expression(search_term)
+        if not expression:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        queryset = queryset.filter(
+            pk__in=search.matching_posts(expression)
+        )
+        return queryset, False
+
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(PrefixSearchMixin, admin.ModelAdmin):
     """Конфигурация отображения данных.
 
     Attributes:
         list_display: отображаемые поля.
-        search_fields: интерфейс для поиска по тайтлу.
+        search_fields: поиск по началу названия или адреса.
+        ordering: порядок по индексу названия.
     """
 
     list_display = (
@@ -42,17 +85,21 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
-    search_fields = ('title',)
+    search_fields = ('title', 'slug')
+    ordering = ('title',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     """Конфигурация отображения данных.
 
     Attributes:
         list_display: отображаемые поля.
+        list_select_related: пост и автор подгружаются одним запросом.
         list_filter: возможность фильтрации по дате.
+        date_hierarchy: переход по датам по индексу created.
+        autocomplete_fields: пост и автор выбираются поиском.
     """
 
     list_display = (
@@ -62,7 +109,10 @@ class CommentAdmin(admin.ModelAdmin):
         'text',
         'created',
     )
+    list_select_related = ('post', 'author')
     list_filter = ('created',)
+    date_hierarchy = 'created'
+    autocomplete_fields = ('post', 'author')
     empty_value_display = '-пусто-'
 
 
@@ -72,6 +122,8 @@ class FollowAdmin(admin.ModelAdmin):
 
     Attributes:
         list_display: отображаемые поля.
+        list_select_related: пользователи подгружаются одним запросом.
+        autocomplete_fields: пользователи выбираются поиском.
     """
 
     list_display = (
@@ -79,4 +131,6 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
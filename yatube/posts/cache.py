@@ -0,0 +1,100 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Group
+
+VERSION_PREFIX: str = 'feed-version'
+GROUPS: tuple = ('groups',)
+GROUP_PREFIX: str = 'group-slug'
+GROUP_TIMEOUT: int = 3600
+
+
+def _key(scope):
+    return ':'.join(str(part) for part in (VERSION_PREFIX, *scope))
+
+
+def _seed():
+    # Новое начальное значение после вытеснения ключа не совпадёт
+    # со старыми версиями, поэтому устаревшие фрагменты не вернутся.
+    return time.time_ns()
+
+
+def version(*scope):
+    """Версия фрагментов ленты scope для ключа {% cache %}.
+
+    Складывается из версии области (index, group, profile) и общей
+    версии групп, которая меняется при правке любой группы.
+    """
+    return _versions(GROUPS, scope)
+
+
+def follow_version(user_id):
+    """Версия фрагментов ленты подписок пользователя.
+
+    Меняется при подписке и отписке, а также при публикации, правке
+    и удалении постов авторов, на которых подписан пользователь
+    (follow_scopes), поэтому читается из кэша без запросов к базе.
+    """
+    return _versions(GROUPS, ('follow', user_id))
+
+
+def follow_scopes(user_ids):
+    """Области лент подписок перечисленных пользователей."""
+    return [('follow', user_id) for user_id in user_ids]
+
+
+def _versions(*scopes):
+    keys = [_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _seed(), None)
+            versions[key] = cache.get(key, 0)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Делает недействительными фрагменты перечисленных областей.
+
+    Версии удаляются одним запросом к кэшу и при следующем чтении
+    заводятся заново, так что сброс лент тысяч подписчиков стоит
+    одного обращения к кэшу.
+    """
+    cache.delete_many([_key(scope) for scope in scopes])
+
+
+def post_scopes(author_id, group_id):
+    """Области ленты, в которых показывается пост.
+
+    Ленты подписок сюда не входят: подписчиков автора сигналы берут
+    у fan_out или timeline.followers и сбрасывают через follow_scopes.
+    """
+    scopes = [('index',), ('profile', author_id)]
+    if group_id:
+        scopes.append(('group', group_id))
+    return scopes
+
+
+def _group_key(slug):
+    return f'{GROUP_PREFIX}:{slug}'
+
+
+def group_by_slug(slug):
+    """Группа по адресу; None, если такой группы нет.
+
+    Группа читается на каждой странице сообщества, поэтому хранится
+    в кэше и сбрасывается сигналами при изменении или удалении.
+    """
+    key = _group_key(slug)
+    group = cache.get(key)
+    if group is None:
+        group = Group.objects.filter(slug=slug).first()
+        if group is not None:
+            cache.set(key, group, GROUP_TIMEOUT)
+    return group
+
+
+def forget_groups(*slugs):
+    """Убирает группы с перечисленными адресами из кэша."""
+    cache.delete_many([_group_key(slug) for slug in slugs])
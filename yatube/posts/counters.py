@@ -0,0 +1,89 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def bump_user(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas.
+
+    Если строки счётчиков ещё нет, при увеличении она создаётся
+    пересчётом, а уменьшение пропускается: команда recount всё равно
+    исправит расхождение.
+    """
+    # Уменьшение не опускает счётчик ниже нуля при расхождении.
+    floor = {
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserStats.objects.filter(user_id=user_id, **floor).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and min(deltas.values()) > 0:
+        recount_users([user_id])
+
+
+def bump_comments(post_id, delta):
+    """Атомарно сдвигает счётчик комментариев поста."""
+    Post.objects.filter(
+        pk=post_id, comments_count__gte=max(-delta, 0)
+    ).update(comments_count=F('comments_count') + delta)
+
+
+def stats_for(user):
+    """Счётчики пользователя, при отсутствии строки — пересчитанные."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users([user.pk])
+        return UserStats.objects.get(user=user)
+
+
+def _totals(queryset, field, ids):
+    return dict(
+        queryset
+        .filter(**{f'{field}__in': ids})
+        .order_by()
+        .values_list(field)
+        .annotate(total=Count('pk'))
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счётчики пользователей, возвращает число исправлений."""
+    posts = _totals(Post.objects, 'author_id', user_ids)
+    followers = _totals(Follow.objects, 'author_id', user_ids)
+    following = _totals(Follow.objects, 'user_id', user_ids)
+    existing = UserStats.objects.in_bulk(user_ids, field_name='user_id')
+    changed, created = [], []
+    for user_id in user_ids:
+        actual = {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        stats = existing.get(user_id)
+        if stats is None:
+            created.append(UserStats(user_id=user_id, **actual))
+        elif any(getattr(stats, key) != value
+                 for key, value in actual.items()):
+            for key, value in actual.items():
+                setattr(stats, key, value)
+            changed.append(stats)
+    UserStats.objects.bulk_create(created, ignore_conflicts=True)
+    UserStats.objects.bulk_update(
+        changed, ['posts_count', 'followers_count', 'following_count']
+    )
+    return len(created) + len(changed)
+
+
+def recount_posts(post_ids):
+    """Пересчитывает счётчики комментариев, возвращает число исправлений."""
+    comments = _totals(Comment.objects, 'post_id', post_ids)
+    changed = []
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        actual = comments.get(post.pk, 0)
+        if post.comments_count != actual:
+            post.comments_count = actual
+            changed.append(post)
+    Post.objects.bulk_update(changed, ['comments_count'])
+    return len(changed)
@@ -0,0 +1,64 @@
+from .models import Comment, Post, TimelineEntry
+
+# Столбцы, которые выводят карточки ленты и пагинаторы.
+POST_FIELDS = (
+    'text',
+    'pub_date',
+    'author',
+    'group',
+    'image',
+    'image_width',
+    'image_height',
+)
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+GROUP_FIELDS = ('title', 'slug')
+
+
+def card_fields(prefix=''):
+    """Имена полей для only(): пост, его автор и группа."""
+    return [
+        prefix + name for name in (
+            *POST_FIELDS,
+            *(f'author__{field}' for field in AUTHOR_FIELDS),
+            *(f'group__{field}' for field in GROUP_FIELDS),
+        )
+    ]
+
+
+def posts(queryset=None):
+    """Посты для карточек ленты с автором и группой.
+
+    Автор и группа присоединяются одним JOIN, из таблиц читаются
+    только столбцы, которые выводят шаблоны: число запросов страницы
+    не зависит от числа постов на ней.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    return (queryset
+            .select_related('author', 'group')
+            .only(*card_fields()))
+
+
+def timeline(user):
+    """Записи ленты подписок user с постами для карточек."""
+    return (TimelineEntry.objects
+            .filter(user=user)
+            .select_related('post__author', 'post__group')
+            .only('user', 'pub_date', *card_fields('post__')))
+
+
+def detail():
+    """Посты для страницы поста: со всеми полями, автором, его
+    счётчиками и группой."""
+    return Post.objects.select_related('author__stats', 'group')
+
+
+def comments(post):
+    """Комментарии к посту с авторами."""
+    return (Comment.objects
+            .filter(post=post)
+            .select_related('author')
+            .only('post', 'text', 'created',
+                  *(f'author__{field}' for field in AUTHOR_FIELDS)))
@@ -1,7 +1,7 @@
 from django.forms import ModelForm
 from django import forms
 
-from .models import Post, Comment
+from .models import Post, Comment, Group
 
 
 class PostForm(ModelForm):
@@ -20,3 +20,32 @@ class CommentForm(forms.ModelForm):
         fields = [
             'text',
         ]
+
+
+class PostChangeListForm(forms.ModelForm):
+    """Правка группы прямо в списке постов админки.
+
+    Группа вводится по адресу (slug) в текстовом поле: в строке не
+    выводится <select> со всеми группами, а текущий адрес берётся из
+    уже подгруженной группы поста без лишних запросов.
+    """
+
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        widget=forms.TextInput(attrs={'size': 16}),
+        label='Группа',
+        help_text='Адрес группы',
+    )
+
+    class Meta:
+        model = Post
+        fields = [
+            'group',
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.group_id:
+            self.initial['group'] = self.instance.group.slug
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Форматы, которые перекодируются при загрузке.
+OPTIMIZED_FORMATS = ('JPEG', 'PNG')
+ORIGINALS_DIR: str = 'originals'
+
+# Уровни каталогов раскладки по хэшу: posts/ab/cd/<hash>.jpg
+SHARD_LEVELS = 2
+
+SHARDED_NAME = r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.'
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+# Поля Post со сведениями о картинке.
+METADATA_FIELDS = (
+    'image_width',
+    'image_height',
+    'image_size',
+    'image_format',
+    'image_hash',
+)
+
+
+def describe(file):
+    """Сведения о файле изображения в виде значений полей Post.
+
+    Файл читается один раз для SHA-256; Pillow разбирает только
+    заголовок, не декодируя пиксели.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file.size,
+        'image_format': image_format,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def forget(post):
+    """Очищает сведения о картинке поста."""
+    post.image_width = post.image_height = post.image_size = None
+    post.image_format = post.image_hash = ''
+
+
+def optimize(file):
+    """Уменьшенная копия загруженного JPEG или PNG либо None.
+
+    Поворачивает картинку по EXIF, отбрасывает метаданные (кроме
+    цветового профиля), ограничивает длинную сторону IMAGE_MAX_EDGE и
+    перекодирует JPEG с качеством IMAGE_JPEG_QUALITY, PNG — без
+    потерь. None — если формат не поддерживается или копия ничем не
+    лучше исходника.
+    """
+    max_edge = settings.IMAGE_MAX_EDGE
+    file.seek(0)
+    original = file.read()
+    file.seek(0)
+    with Image.open(BytesIO(original)) as image:
+        image_format = image.format
+        if image_format not in OPTIMIZED_FORMATS:
+            return None
+        # JPEG сразу декодируется в уменьшенном масштабе, если можно.
+        image.draft('RGB', (max_edge, max_edge))
+        has_metadata = bool(image.info.get('exif'))
+        icc_profile = image.info.get('icc_profile')
+        result = ImageOps.exif_transpose(image)
+        resized = max(result.size) > max_edge
+        if resized:
+            result.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = BytesIO()
+        if image_format == 'JPEG':
+            if result.mode not in ('RGB', 'L'):
+                result = result.convert('RGB')
+            result.save(
+                buffer, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY,
+                optimize=True, progressive=True, icc_profile=icc_profile,
+            )
+        else:
+            result.save(buffer, 'PNG', optimize=True,
+                        icc_profile=icc_profile)
+    data = buffer.getvalue()
+    if len(data) >= len(original) and not (resized or has_metadata):
+        return None
+    return ContentFile(data, name=file.name)
+
+
+def optimize_upload(field_file):
+    """Заменяет ещё не сохранённую загрузку её уменьшенной копией.
+
+    С IMAGE_KEEP_ORIGINALS исходник сохраняется в ORIGINALS_DIR.
+    Возвращает число сэкономленных байт.
+    """
+    optimized = optimize(field_file.file)
+    if optimized is None:
+        return 0
+    before = field_file.file.size
+    if settings.IMAGE_KEEP_ORIGINALS:
+        field_file.file.seek(0)
+        default_storage.save(
+            os.path.join(ORIGINALS_DIR, os.path.basename(field_file.name)),
+            field_file.file,
+        )
+    field_file.file = optimized
+    saved = before - optimized.size
+    logger.info('Картинка %s: %d -> %d байт, сэкономлено %d байт',
+                field_file.name, before, optimized.size, saved)
+    return saved
+
+
+def sharded_name(image_hash, image_format, name):
+    """Имя файла в раскладке по хэшу содержимого: ab/cd/<hash>.jpg.
+
+    Расширение берётся по формату, а для неизвестных форматов — из
+    исходного имени. Имя относительно upload_to поля.
+    """
+    extension = EXTENSIONS.get(image_format)
+    if extension is None:
+        extension = os.path.splitext(name)[1].lower()
+    shards = [
+        image_hash[level * 2:level * 2 + 2] for level in range(SHARD_LEVELS)
+    ]
+    return posixpath.join(*shards, image_hash + extension)
+
+
+def place(field_file, image_hash, image_format):
+    """Называет несохранённую загрузку по хэшу её содержимого.
+
+    Если файл с таким содержимым уже лежит в хранилище, загрузка не
+    сохраняется повторно, а поле ссылается на него. Файлы картинок
+    не удаляются вместе с постами, так что общий файл безопасен.
+    Возвращает True, если нашёлся дубликат.
+    """
+    relative = sharded_name(image_hash, image_format, field_file.name)
+    name = field_file.field.generate_filename(field_file.instance, relative)
+    if field_file.storage.exists(name):
+        field_file.name = name
+        field_file._committed = True
+        return True
+    field_file.name = relative
+    return False
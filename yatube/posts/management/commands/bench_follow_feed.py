@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Follow, Post, User
+from posts.views import get_follow_page_obj
+
+ENGINES = ('query', 'merge', 'timeline')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает движки ленты подписок на синтетических данных. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors', type=int, nargs='+', default=[10, 1000, 10000],
+            help='Число авторов в подписках читателя.',
+        )
+        parser.add_argument(
+            '--posts-per-author', type=int, default=5,
+        )
+        parser.add_argument(
+            '--pages', type=int, default=3,
+            help='Сколько страниц пролистать курсором.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+        )
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        self.stdout.write(
+            f'{"authors":>8} {"engine":>9} {"first, ms":>10} '
+            f'{"page, ms":>9} {"queries":>8}'
+        )
+        for authors in options['authors']:
+            with transaction.atomic():
+                reader = self.seed(authors, options['posts_per_author'])
+                for engine in ENGINES:
+                    self.report(authors, engine, reader, options)
+                transaction.set_rollback(True)
+
+    def seed(self, authors, posts_per_author):
+        reader = User.objects.create(username='bench_reader')
+        User.objects.bulk_create(
+            [User(username=f'bench_author_{number}')
+             for number in range(authors)],
+            batch_size=500,
+        )
+        author_ids = list(
+            User.objects
+            .filter(username__startswith='bench_author_')
+            .values_list('pk', flat=True)
+        )
+        Post.objects.bulk_create(
+            [Post(text='bench', author_id=author_id)
+             for author_id in author_ids
+             for _ in range(posts_per_author)],
+            batch_size=500,
+        )
+        now = timezone.now()
+        posts = list(Post.objects.filter(author_id__in=author_ids))
+        for post in posts:
+            post.pub_date = now - timedelta(
+                seconds=random.randint(0, 90 * 24 * 3600)
+            )
+        Post.objects.bulk_update(posts, ['pub_date'], batch_size=500)
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author_id=author_id)
+             for author_id in author_ids],
+            batch_size=500,
+        )
+        timeline.rebuild(reader.pk)
+        return reader
+
+    def report(self, authors, engine, reader, options):
+        first, deep, queries = [], [], 0
+        for _ in range(options['repeat']):
+            data = {}
+            for number in range(options['pages']):
+                request = self.factory.get('/follow/', data)
+                request.user = reader
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    page = get_follow_page_obj(request, engine)
+                    elapsed = (time.perf_counter() - started) * 1000
+                (first if number == 0 else deep).append(elapsed)
+                queries = max(queries, len(context))
+                data = {'cursor': page.paginator.next_cursor or ''}
+        deep_ms = statistics.median(deep) if deep else 0
+        self.stdout.write(
+            f'{authors:>8} {engine:>9} {statistics.median(first):>10.2f} '
+            f'{deep_ms:>9.2f} {queries:>8}'
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры, объём, формат и хэш картинок постов, '
+            'загруженных до появления этих полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов обновлять за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        described = missing = 0
+        last_pk = 0
+        while True:
+            posts = list(
+                Post.objects
+                .filter(pk__gt=last_pk, image_hash='')
+                .exclude(image='')
+                .order_by('pk')
+                .only('pk', 'image')[:options['chunk_size']]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            for post in posts:
+                try:
+                    with post.image.open('rb') as file:
+                        metadata = images.describe(file)
+                except (OSError, SyntaxError, ValueError):
+                    missing += 1
+                    continue
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+                described += 1
+            Post.objects.bulk_update(
+                [post for post in posts if post.image_hash],
+                images.METADATA_FIELDS,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Описано картинок: {described}, не удалось прочитать: {missing}.'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или обрезает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи; по умолчанию все.',
+        )
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='Только обрезать ленты до TIMELINE_LENGTH.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько лент обрабатывать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        action = timeline.trim if options['trim'] else timeline.rebuild
+        user_ids = list(users.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        for start in range(0, len(user_ids), chunk_size):
+            with transaction.atomic():
+                for user_id in user_ids[start:start + chunk_size]:
+                    action(user_id)
+            self.stdout.write(
+                f'{min(start + chunk_size, len(user_ids))}/{len(user_ids)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Ленты обновлены.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за один проход.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        repaired = 0
+        for model, recount in ((User, counters.recount_users),
+                               (Post, counters.recount_posts)):
+            last_pk = 0
+            while True:
+                ids = list(
+                    model.objects
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                repaired += recount(ids)
+                last_pk = ids[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {repaired}.')
+        )
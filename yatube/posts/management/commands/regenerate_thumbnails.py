@@ -0,0 +1,67 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии всех изображений постов для '
+            'геометрий из THUMBNAIL_GEOMETRIES и их вариантов параллельно '
+            'в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов; 0 — в текущем процессе.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько изображений выбирать из БД за один запрос.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить существующие миниатюры и создать заново.',
+        )
+
+    def handle(self, *args, **options):
+        generate = partial(thumbnails.generate, force=options['force'])
+        images = done = expected = 0
+        if options['workers']:
+            pool = thumbnails.pool(options['workers'])
+            run = partial(pool.map, chunksize=16)
+        else:
+            pool, run = None, map
+        try:
+            for names, widths in self.chunks(options['chunk_size']):
+                images += len(names)
+                expected += sum(
+                    len(thumbnails.geometries(width)) for width in widths
+                )
+                done += sum(run(generate, names, widths))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {images}, миниатюр готово: {done} из {expected}.'
+        ))
+
+    def chunks(self, size):
+        """Имена файлов изображений и ширины исходников порциями по
+        первичному ключу."""
+        last_pk = 0
+        while True:
+            rows = list(
+                Post.objects
+                .filter(pk__gt=last_pk)
+                .exclude(image='')
+                .order_by('pk')
+                .values_list('pk', 'image', 'image_width')[:size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            yield ([name for _, name, _ in rows],
+                   [width for _, _, width in rows])
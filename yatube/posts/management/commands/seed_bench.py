@@ -0,0 +1,361 @@
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import images, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+# Состояние генерации, которое дочерние процессы получают при fork():
+# параметры запуска, id созданных строк и веса распределений.
+_context = {}
+
+# Размер синтетических картинок: как у фото после уменьшения при
+# загрузке до IMAGE_MAX_EDGE.
+IMAGE_SIZE = (2048, 1365)
+
+# Сколько лент собирать в одной транзакции. Лента — до
+# TIMELINE_LENGTH строк, поэтому порция меньше, чем у bulk_create.
+TIMELINES_CHUNK_SIZE = 500
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса закона Ципфа: k-й по популярности получает
+    долю, пропорциональную 1 / k ** exponent."""
+    return list(itertools.accumulate(
+        rank ** -exponent for rank in range(1, count + 1)
+    ))
+
+
+def _generator(kind, start):
+    """Faker и random для порции, одинаковые при любом числе процессов."""
+    seed = f'{_context["seed"]}:{kind}:{start}'
+    if 'fake' not in _context:
+        _context['fake'] = Faker(_context['locale'])
+    fake = _context['fake']
+    fake.seed_instance(seed)
+    return fake, random.Random(seed)
+
+
+def _date(rng):
+    """Случайный момент за последние days дней."""
+    return _context['now'] - timedelta(
+        seconds=rng.random() * _context['days'] * 86400
+    )
+
+
+def _choose(rng, population, count):
+    """count элементов population с весами Ципфа из контекста."""
+    return rng.choices(
+        _context[population], cum_weights=_context[f'{population}_weights'],
+        k=count,
+    )
+
+
+def generate(task):
+    """Строки одной порции для bulk_create: кортежи значений полей.
+
+    Выполняется в дочернем процессе; к базе не обращается.
+    """
+    kind, start, count = task
+    fake, rng = _generator(kind, start)
+    numbers = range(start, start + count)
+    if kind == 'users':
+        return [
+            (f'{fake.user_name()}_{number}', fake.first_name(),
+             fake.last_name(), fake.free_email(), _date(rng))
+            for number in numbers
+        ]
+    if kind == 'groups':
+        return [
+            (fake.catch_phrase()[:200], f'group-{number}',
+             fake.paragraph(nb_sentences=3))
+            for number in numbers
+        ]
+    if kind == 'posts':
+        authors = _choose(rng, 'authors', count)
+        groups = _choose(rng, 'groups', count)
+        ungrouped = _context['ungrouped']
+        return [
+            (fake.paragraph(nb_sentences=rng.randint(1, 12)), author,
+             None if rng.random() < ungrouped else group, _date(rng),
+             rng.random() < _context['images'])
+            for author, group in zip(authors, groups)
+        ]
+    if kind == 'comments':
+        posts = _context['posts']
+        return [
+            (rng.choice(posts), rng.choice(_context['users']),
+             fake.sentence(nb_words=rng.randint(3, 25)), _date(rng))
+            for _ in numbers
+        ]
+    if kind == 'follows':
+        users = _context['users']
+        authors = _choose(rng, 'authors', count)
+        return [
+            (user, author)
+            for user, author in zip(rng.choices(users, k=count), authors)
+            if user != author
+        ]
+    raise ValueError(f'Неизвестная порция: {kind}')
+
+
+def synthetic_image(number):
+    """JPEG-снимок со своим градиентом и фигурами."""
+    rng = random.Random(number)
+    first, second = (
+        tuple(rng.randrange(256) for _ in range(3)) for _ in range(2)
+    )
+    image = Image.linear_gradient('L').resize(IMAGE_SIZE).convert('RGB')
+    image = Image.composite(
+        Image.new('RGB', IMAGE_SIZE, first),
+        Image.new('RGB', IMAGE_SIZE, second),
+        image.convert('L'),
+    )
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+        radius = rng.randint(40, 400)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=82, optimize=True)
+    return ContentFile(buffer.getvalue(), name=f'bench_{number}.jpg')
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Разрешает bulk_create записать заданные даты в auto_now_add.
+
+    Иначе все строки получили бы время вставки, и ленты с курсорами
+    тестировались бы на одной секунде.
+    """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями, подписками и картинками в объёмах боевого сайта. '
+        'Подписчики распределены по закону Ципфа, размеры групп и '
+        'активность авторов неравномерны. Строки генерируют дочерние '
+        'процессы, пишет их основной порциями bulk_create; счётчики и '
+        'ленты подписок пересчитываются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=1_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=2_000_000)
+        parser.add_argument(
+            '--follows', type=int, default=1_000_000,
+            help='Сколько подписок создать; повторы отбрасываются.',
+        )
+        parser.add_argument(
+            '--follow-skew', type=float, default=1.1,
+            help='Показатель закона Ципфа для подписчиков и постов '
+                 'авторов: чем больше, тем сильнее популярные '
+                 'авторы отрываются от остальных.',
+        )
+        parser.add_argument(
+            '--group-skew', type=float, default=1.3,
+            help='Показатель закона Ципфа для размеров групп.',
+        )
+        parser.add_argument(
+            '--ungrouped', type=float, default=0.3,
+            help='Доля постов без группы.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--distinct-images', type=int, default=50,
+            help='Сколько разных файлов картинок создать; посты '
+                 'ссылаются на них повторно, как на одинаковые загрузки.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней разбросать даты.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько процессов генерируют строки.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--locale', default='ru_RU')
+        parser.add_argument(
+            '--password', default='bench',
+            help='Пароль всех созданных пользователей.',
+        )
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не собирать ленты подписок: это самый долгий шаг, '
+                 'до TIMELINE_LENGTH строк на каждого подписчика.',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Нужен хотя бы один процесс и одна строка.')
+        if options['follow_skew'] <= 0 or options['group_skew'] <= 0:
+            raise CommandError('Показатели распределений должны быть > 0.')
+        self.options = options
+        self.started = time.perf_counter()
+        _context.clear()
+        _context.update(
+            seed=options['seed'], locale=options['locale'],
+            days=options['days'], now=timezone.now(),
+            ungrouped=options['ungrouped'], images=options['images'],
+        )
+        rng = random.Random(options['seed'])
+
+        password = make_password(options['password'])
+        user_ids = self.seed('users', options['users'], User, lambda row: User(
+            username=row[0], first_name=row[1], last_name=row[2],
+            email=row[3], date_joined=row[4], password=password,
+        ))
+        group_ids = self.seed('groups', options['groups'], Group,
+                              lambda row: Group(title=row[0], slug=row[1],
+                                                description=row[2]))
+        if not user_ids:
+            raise CommandError('Постам и подпискам нужны пользователи.')
+        # Популярность не совпадает с порядком регистрации.
+        authors = rng.sample(user_ids, len(user_ids))
+        groups = rng.sample(group_ids, len(group_ids)) or [None]
+        _context.update(
+            users=user_ids,
+            authors=authors,
+            authors_weights=zipf_weights(
+                len(authors), options['follow_skew']
+            ),
+            groups=groups,
+            groups_weights=zipf_weights(len(groups), options['group_skew']),
+        )
+
+        pictures = self.pictures(
+            options['distinct_images'] if options['images'] else 0
+        )
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            post_ids = self.seed(
+                'posts', options['posts'], Post,
+                lambda row: self.post(row, pictures, rng),
+            )
+        _context['posts'] = post_ids
+        if post_ids:
+            with explicit_dates(Comment._meta.get_field('created')):
+                self.seed('comments', options['comments'], Comment,
+                          lambda row: Comment(post_id=row[0],
+                                              author_id=row[1],
+                                              text=row[2], created=row[3]))
+        self.seed('follows', options['follows'], Follow,
+                  lambda row: Follow(user_id=row[0], author_id=row[1]),
+                  ignore_conflicts=True)
+
+        self.stdout.write('Пересчёт счётчиков...')
+        call_command('recount', stdout=self.stdout)
+        if not options['skip_timelines']:
+            self.timelines()
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - self.started:.0f} с.'
+        ))
+
+    def seed(self, kind, total, model, build, ignore_conflicts=False):
+        """Создаёт total строк model и возвращает id новых строк.
+
+        Порции генерируются параллельно и по порядку пишутся здесь:
+        SQLite допускает одного писателя, а генерация — основная
+        работа. id читаются из базы, потому что bulk_create
+        возвращает их не на всех СУБД. Номера строк продолжают
+        последний id, так что повторный запуск дописывает данные.
+        """
+        last_pk = (model.objects.order_by('-pk')
+                   .values_list('pk', flat=True).first() or 0)
+        batch_size = self.options['batch_size']
+        tasks = [
+            (kind, last_pk + start, min(batch_size, total - start))
+            for start in range(0, total, batch_size)
+        ]
+        done = 0
+        pool = multiprocessing.get_context('fork').Pool(
+            self.options['workers']
+        )
+        with pool:
+            for rows in pool.imap(generate, tasks):
+                with transaction.atomic():
+                    # Размер INSERT выбирает Django по пределам СУБД.
+                    model.objects.bulk_create(
+                        [build(row) for row in rows],
+                        ignore_conflicts=ignore_conflicts,
+                    )
+                done += len(rows)
+                self.progress(kind, done, total)
+        return list(model.objects.filter(pk__gt=last_pk)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def post(self, row, pictures, rng):
+        text, author_id, group_id, pub_date, with_image = row
+        if not (with_image and pictures):
+            return Post(text=text, author_id=author_id, group_id=group_id,
+                        pub_date=pub_date)
+        name, metadata = rng.choice(pictures)
+        return Post(text=text, author_id=author_id, group_id=group_id,
+                    pub_date=pub_date, image=name, **metadata)
+
+    def pictures(self, count):
+        """Файлы картинок в раскладке по хэшу и сведения о них."""
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        pictures = []
+        for number in range(count):
+            file = synthetic_image(self.options['seed'] * count + number)
+            metadata = images.describe(file)
+            name = field.generate_filename(None, images.sharded_name(
+                metadata['image_hash'], metadata['image_format'], file.name
+            ))
+            if not storage.exists(name):
+                name = storage.save(name, file)
+            pictures.append((name, metadata))
+        if count:
+            self.stdout.write(f'Картинок: {count}')
+        return pictures
+
+    def timelines(self):
+        """Собирает ленты подписчиков порциями в транзакциях."""
+        user_ids = list(Follow.objects.order_by('user_id')
+                        .values_list('user_id', flat=True).distinct())
+        chunk_size = TIMELINES_CHUNK_SIZE
+        for start in range(0, len(user_ids), chunk_size):
+            with transaction.atomic():
+                for user_id in user_ids[start:start + chunk_size]:
+                    timeline.rebuild(user_id)
+            self.progress('timelines', min(start + chunk_size,
+                                           len(user_ids)), len(user_ids))
+
+    def progress(self, kind, done, total):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{kind}: {done}/{total}, {elapsed:.0f} с')
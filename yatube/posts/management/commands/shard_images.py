@@ -0,0 +1,124 @@
+import hashlib
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в раскладку по хэшу '
+            'posts/ab/cd/<hash>.jpg и переписывает поле image порциями. '
+            'Одинаковые файлы хранятся один раз. Прерванный перенос '
+            'продолжается повторным запуском; он же удаляет старые '
+            'файлы, оставшиеся от прерванного запуска.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов переносить за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='Не удалять файлы по старым путям.',
+        )
+
+    def handle(self, *args, **options):
+        moved = deduplicated = missing = 0
+        last_pk = 0
+        while True:
+            posts = list(
+                Post.objects
+                .filter(pk__gt=last_pk)
+                .exclude(image='')
+                .exclude(image__regex=images.SHARDED_NAME)
+                .order_by('pk')
+                .only('pk', 'image', 'image_hash', 'image_format')
+                [:options['batch_size']]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            updated, old_names = [], []
+            for post in posts:
+                old_name = post.image.name
+                try:
+                    duplicate = self.move(post)
+                except OSError:
+                    missing += 1
+                    continue
+                updated.append(post)
+                old_names.append(old_name)
+                deduplicated += duplicate
+            with transaction.atomic():
+                Post.objects.bulk_update(updated, ['image', 'image_hash'])
+            moved += len(updated)
+            if not options['keep_old']:
+                self.delete(old_names)
+            self.stdout.write(f'Перенесено: {moved}, до id {last_pk}')
+        swept = 0
+        if not options['keep_old']:
+            swept = self.sweep(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, из них дубликатов: '
+            f'{deduplicated}, файлов не найдено: {missing}, '
+            f'удалено старых файлов: {swept}.'
+        ))
+
+    def move(self, post):
+        """Копирует файл поста по новому пути; True, если он уже был."""
+        storage = post.image.storage
+        with storage.open(post.image.name, 'rb') as file:
+            if not post.image_hash:
+                digest = hashlib.sha256()
+                for chunk in file.chunks():
+                    digest.update(chunk)
+                post.image_hash = digest.hexdigest()
+                file.seek(0)
+            relative = images.sharded_name(
+                post.image_hash, post.image_format, post.image.name
+            )
+            name = post.image.field.generate_filename(post, relative)
+            duplicate = storage.exists(name)
+            if not duplicate:
+                name = storage.save(name, file)
+        post.image.name = name
+        return duplicate
+
+    def delete(self, names):
+        """Удаляет старые файлы, на которые больше не ссылается ни один
+        пост; возвращает их число."""
+        storage = Post._meta.get_field('image').storage
+        referenced = set(
+            Post.objects.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        deleted = 0
+        for name in names:
+            if name not in referenced:
+                storage.delete(name)
+                deleted += 1
+        return deleted
+
+    def sweep(self, batch_size):
+        """Удаляет файлы старой раскладки, на которые не ссылается ни
+        один пост.
+
+        Если запуск прервался между записью новых имён и удалением
+        старых файлов, ссылок на эти файлы уже нет; повторный запуск
+        находит их здесь. Старая раскладка — файлы прямо в каталоге
+        upload_to, в раскладке по хэшу файлы лежат в подкаталогах.
+        """
+        field = Post._meta.get_field('image')
+        directory = field.upload_to.rstrip('/')
+        try:
+            _, files = field.storage.listdir(directory)
+        except FileNotFoundError:
+            return 0
+        names = [posixpath.join(directory, file) for file in files]
+        return sum(
+            self.delete(names[start:start + batch_size])
+            for start in range(0, len(names), batch_size)
+        )
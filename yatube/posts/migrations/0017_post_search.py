@@ -0,0 +1,89 @@
+from django.db import migrations
+
+# Строки индекса: пост — rowid = 2 * id, комментарий — 2 * id + 1,
+# поэтому триггеры находят свою строку по rowid, без поиска по таблице.
+SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_search USING fts5(
+        body,
+        post_id UNINDEXED,
+        comment_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO posts_search (rowid, body, post_id, comment_id)
+    SELECT id * 2, text, id, NULL FROM posts_post
+    """,
+    """
+    INSERT INTO posts_search (rowid, body, post_id, comment_id)
+    SELECT id * 2 + 1, text, post_id, id FROM posts_comment
+    WHERE post_id IS NOT NULL
+    """,
+    """
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_search (rowid, body, post_id, comment_id)
+        VALUES (new.id * 2, new.text, new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_update AFTER UPDATE OF text ON posts_post
+    WHEN old.text IS NOT new.text
+    BEGIN
+        UPDATE posts_search SET body = new.text WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_insert AFTER INSERT ON posts_comment
+    WHEN new.post_id IS NOT NULL
+    BEGIN
+        INSERT INTO posts_search (rowid, body, post_id, comment_id)
+        VALUES (new.id * 2 + 1, new.text, new.post_id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_update
+    AFTER UPDATE OF text, post_id ON posts_comment
+    WHEN old.text IS NOT new.text OR old.post_id IS NOT new.post_id
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO posts_search (rowid, body, post_id, comment_id)
+        SELECT new.id * 2 + 1, new.text, new.post_id, new.id
+        WHERE new.post_id IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_delete AFTER DELETE ON posts_comment
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS posts_comment_search_delete',
+    'DROP TRIGGER IF EXISTS posts_comment_search_update',
+    'DROP TRIGGER IF EXISTS posts_comment_search_insert',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_fill_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SQL, REVERSE_SQL),
+    ]
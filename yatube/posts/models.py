@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.querysets import TemplateGuardedQuerySet
+
 from .validators import validate_not_empty
 
 User = get_user_model()
@@ -24,6 +26,11 @@ class Group(models.Model):
         verbose_name='Описание',
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['title'], name='group_title_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.title
 
@@ -38,6 +45,14 @@ class Post(models.Model):
         group: возможность, при добавлении новой записи можно было сослаться
                на сообщество.
         image: возможность добавить заглавную картинку.
+        image_width, image_height: размеры картинки в пикселях.
+        image_size: размер файла картинки в байтах.
+        image_format: формат картинки по данным Pillow (JPEG, PNG...).
+        image_hash: SHA-256 содержимого файла картинки.
+        comments_count: число комментариев, поддерживается сигналами.
+
+    Сведения о картинке заполняются при загрузке, поэтому страницам
+    не нужно открывать файл, чтобы узнать его размеры.
     """
 
     text = models.TextField(
@@ -69,6 +84,43 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True, blank=True, editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True, blank=True, editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        verbose_name='Размер картинки, байт',
+        null=True, blank=True, editable=False,
+    )
+    image_format = models.CharField(
+        verbose_name='Формат картинки',
+        max_length=10, blank=True, editable=False,
+    )
+    image_hash = models.CharField(
+        verbose_name='SHA-256 картинки',
+        max_length=64, blank=True, editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = TemplateGuardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'], name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -106,6 +158,11 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created'], name='comment_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -137,3 +194,79 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_employee_user'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок.
+
+    Заполняется при публикации поста (fan-out on write) и при подписке,
+    поэтому лента читается одним диапазонным запросом по индексу
+    (user, pub_date, post). Длина ленты ограничена TIMELINE_LENGTH.
+
+    Attributes:
+        user: владелец ленты.
+        post: пост автора, на которого подписан пользователь.
+        pub_date: копия даты публикации поста для сортировки.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя.
+
+    Поддерживаются сигналами Post и Follow атомарными F()-обновлениями,
+    расхождения исправляет команда recount.
+
+    Attributes:
+        user: пользователь.
+        posts_count: число постов пользователя.
+        followers_count: число подписчиков.
+        following_count: число подписок.
+    """
+
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок',
+        default=0,
+    )
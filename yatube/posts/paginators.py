@@ -0,0 +1,334 @@
+import heapq
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .models import Post, User
+
+NEXT: str = 'n'
+PREVIOUS: str = 'p'
+CURSOR_SALT: str = 'posts.paginators.cursor'
+SEARCH_SALT: str = 'posts.paginators.search'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+POST: int = 0
+STREAM: int = 1
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Страница выбирается диапазонным запросом по индексу, без COUNT(*)
+    и OFFSET, поэтому глубокие страницы открываются так же быстро, как
+    первая, а новые посты не сдвигают уже выданные страницы.
+    Ссылки по номеру (?page=) продолжают работать по старой схеме.
+
+    Attributes:
+        cursor: курсор, по которому построена текущая страница.
+        next_cursor: курсор следующей страницы.
+        previous_cursor: курсор предыдущей страницы.
+    """
+
+    key_fields = ('pub_date', 'id')
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        self.ordering = [f'-{field}' for field in self.key_fields]
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+        if count is not None:
+            # Известное заранее число объектов избавляет от COUNT(*).
+            self.count = count
+        self.cursor = ''
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._window_pages = None
+
+    @property
+    def num_pages(self):
+        # В курсорном режиме известны только соседние страницы.
+        if self._window_pages is None:
+            return super().num_pages
+        return self._window_pages
+
+    @property
+    def last_cursor(self):
+        return self.make_cursor(PREVIOUS)
+
+    def make_cursor(self, direction, obj=None):
+        return encode_cursor(direction, obj)
+
+    def read_cursor(self, cursor):
+        return decode_cursor(cursor)
+
+    def get_page(self, number=None, cursor=None):
+        """Страница по курсору, либо по номеру для старых ссылок."""
+        if cursor is None and number is not None:
+            page = super().get_page(number)
+        else:
+            page = self.cursor_page(cursor)
+        if page.has_next():
+            self.next_cursor = self.make_cursor(NEXT, page.object_list[-1])
+        if page.has_previous():
+            self.previous_cursor = self.make_cursor(
+                PREVIOUS, page.object_list[0]
+            )
+        return page
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = list(page.object_list)
+        return page
+
+    def cursor_page(self, cursor):
+        direction, key = self.read_cursor(cursor)
+        if direction is None:
+            direction, key = NEXT, None
+        else:
+            self.cursor = cursor
+        items = self._fetch(direction, key, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_previous, has_next = has_more, key is not None
+        else:
+            has_previous, has_next = key is not None, has_more
+        number = 2 if has_previous else 1
+        self._window_pages = number + has_next
+        return self._get_page(items, number, self)
+
+    def _fetch(self, direction, key, limit):
+        """Первые limit объектов за ключом key в направлении direction."""
+        queryset = self.object_list
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        if key is not None:
+            queryset = queryset.filter(self._beyond(direction, *key))
+        return list(queryset[:limit])
+
+    def _beyond(self, direction, pub_date, pk):
+        date_field, id_field = self.key_fields
+        lookup = 'lt' if direction == NEXT else 'gt'
+        return (
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__{lookup}': pk})
+        )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор материализованной ленты подписок.
+
+    Листает записи TimelineEntry по (pub_date, post_id), а на страницу
+    отдаёт сами посты, поэтому курсоры совместимы с CursorPaginator.
+    """
+
+    key_fields = ('pub_date', 'post_id')
+
+    def _get_page(self, object_list, number, paginator):
+        posts = [entry.post for entry in object_list]
+        return super()._get_page(posts, number, paginator)
+
+
+class MergePaginator(CursorPaginator):
+    """Лента подписок через k-way слияние потоков авторов (fan-out on read).
+
+    Вместо одного запроса с author_id__in по всем подпискам берёт
+    из индекса (author, pub_date) новейшие id постов отдельных авторов
+    и сливает их кучей. Запрашиваются только авторы, чьи посты могут
+    попасть на страницу: слияние останавливается, как только она
+    заполнена. Старые ссылки ?page= обслуживаются обычным запросом.
+
+    Затравка кучи всё равно стоит по одной пробе индекса на автора,
+    поэтому в bench_follow_feed слияние медленнее и 'query', и
+    'timeline'; движок оставлен для сравнения и по умолчанию не включён.
+    """
+
+    def __init__(self, object_list, per_page, authors, **kwargs):
+        self.posts = object_list
+        self.authors = authors
+        super().__init__(
+            object_list.filter(author_id__in=authors), per_page, **kwargs
+        )
+
+    def _fetch(self, direction, key, limit):
+        # Элементы кучи: (дата, id, вид, pk поста или автора, курсор).
+        # Заглушка автора (вид 1) стоит не ниже его ещё не прочитанных
+        # постов и при извлечении заменяется следующей порцией из индекса.
+        sign = -1 if direction == NEXT else 1
+        heap = [
+            (sign * _micros(edge), -math.inf, STREAM, author_id, key)
+            for author_id, edge in self._edges(direction, key)
+        ]
+        heapq.heapify(heap)
+        found = []
+        while heap and len(found) < limit:
+            *_, kind, pk, after = heapq.heappop(heap)
+            if kind == POST:
+                found.append(pk)
+                continue
+            stream = self._stream(pk, direction, after, limit)
+            for pub_date, post_id in stream:
+                heapq.heappush(heap, (
+                    sign * _micros(pub_date), sign * post_id, POST,
+                    post_id, None,
+                ))
+            if len(stream) == limit:
+                pub_date, post_id = stream[-1]
+                heapq.heappush(heap, (
+                    sign * _micros(pub_date), sign * post_id, STREAM,
+                    pk, (pub_date, post_id),
+                ))
+        posts = self.posts.in_bulk(found)
+        return [posts[pk] for pk in found if pk in posts]
+
+    def _edges(self, direction, key):
+        """Самая свежая (или старая) дата за ключом для каждого автора.
+
+        Для каждого автора это отдельная проба ORDER BY pub_date
+        LIMIT 1 по индексу (author, pub_date): она читает одну строку
+        индекса, а не все посты автора, как MAX() с GROUP BY. Авторы
+        без постов за ключом пропускаются.
+        """
+        head = Post.objects.filter(author_id=OuterRef('pk'))
+        if direction == PREVIOUS:
+            head = head.order_by('pub_date', 'id')
+        else:
+            head = head.order_by('-pub_date', '-id')
+        if key is not None:
+            head = head.filter(self._beyond(direction, *key))
+        edges = (User.objects
+                 .filter(pk__in=self.authors)
+                 .order_by()
+                 .annotate(edge=Subquery(head.values('pub_date')[:1]))
+                 .values_list('pk', 'edge'))
+        return [(author_id, edge) for author_id, edge in edges if edge]
+
+    def _stream(self, author_id, direction, key, limit):
+        """Следующие limit пар (pub_date, id) одного автора."""
+        queryset = (Post.objects
+                    .filter(author_id=author_id)
+                    .order_by(*self.ordering))
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        if key is not None:
+            queryset = queryset.filter(self._beyond(direction, *key))
+        return list(queryset.values_list('pub_date', 'id')[:limit])
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорный пагинатор результатов полнотекстового поиска.
+
+    Порядок задаёт релевантность BM25 из индекса posts_search, ключ
+    курсора — (score, id). Номера страниц не поддерживаются: любая
+    страница открывается по курсору одним запросом к индексу.
+    Постам на странице проставляются search_score и snippet.
+    """
+
+    def __init__(self, object_list, per_page, query='', **kwargs):
+        self.expression = search.match_expression(query)
+        super().__init__(object_list, per_page, **kwargs)
+
+    def get_page(self, number=None, cursor=None):
+        return super().get_page(cursor=cursor)
+
+    def make_cursor(self, direction, obj=None):
+        key = None
+        if obj is not None:
+            key = (obj.search_score, obj.pk)
+        return signing.dumps((direction, key), salt=SEARCH_SALT)
+
+    def read_cursor(self, cursor):
+        if not cursor:
+            return None, None
+        try:
+            direction, key = signing.loads(cursor, salt=SEARCH_SALT)
+            if direction not in (NEXT, PREVIOUS):
+                return None, None
+            if key is None:
+                return direction, None
+            score, pk = key
+            return direction, (float(score), int(pk))
+        except (signing.BadSignature, TypeError, ValueError):
+            return None, None
+
+    def _fetch(self, direction, key, limit):
+        if not self.expression:
+            return []
+        rows = search.ranked(
+            self.expression, key, limit, reverse=direction == PREVIOUS
+        )
+        posts = self.object_list.in_bulk([post_id for post_id, *_ in rows])
+        snippets = search.snippets(
+            self.expression, [rowid for *_, rowid in rows]
+        )
+        found = []
+        for post_id, score, rowid in rows:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_score = score
+            post.snippet = snippets.get(rowid, '')
+            found.append(post)
+        return found
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) по всей таблице.
+
+    Точно считаются только первые exact_limit строк. Если их больше,
+    для выборки без фильтров число строк оценивается по наибольшему id
+    (один запрос по первичному ключу), а для отфильтрованной остаётся
+    нижней границей. Подходит для списков админки, где важен порядок
+    величины, а не точное число.
+    """
+
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        exact = queryset.order_by()[:self.exact_limit + 1].count()
+        if exact <= self.exact_limit or queryset.query.where:
+            return exact
+        newest = queryset.model._default_manager.aggregate(
+            newest=Max('pk')
+        )['newest']
+        return max(newest or 0, exact)
+
+
+def _micros(value):
+    """Дата в целых микросекундах, чтобы сравнивать без потери точности."""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_cursor(direction, post=None):
+    """Непрозрачный подписанный курсор относительно поста."""
+    key = None
+    if post is not None:
+        key = (post.pub_date.isoformat(), post.pk)
+    return signing.dumps((direction, key), salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, (pub_date, id)) или (None, None)."""
+    if not cursor:
+        return None, None
+    try:
+        direction, key = signing.loads(cursor, salt=CURSOR_SALT)
+        if direction not in (NEXT, PREVIOUS):
+            return None, None
+        if key is None:
+            return direction, None
+        pub_date, pk = key
+        pub_date = parse_datetime(pub_date)
+        if pub_date is None:
+            return None, None
+        return direction, (pub_date, int(pk))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None, None
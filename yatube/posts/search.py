@@ -0,0 +1,161 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+TABLE: str = 'posts_search'
+# Совпадение только в комментарии весит вдвое меньше, чем в посте.
+COMMENT_WEIGHT: float = 0.5
+MAX_WORDS: int = 8
+SNIPPET_TOKENS: int = 24
+MARK_OPEN: str = '\x02'
+MARK_CLOSE: str = '\x03'
+WORD = re.compile(r'\w+')
+# Строки индекса: пост — rowid = 2 * id, комментарий — 2 * id + 1.
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_insert
+    AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO {TABLE} (rowid, body, post_id, comment_id)
+        VALUES (new.id * 2, new.text, new.id, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_update
+    AFTER UPDATE OF text ON posts_post
+    WHEN old.text IS NOT new.text
+    BEGIN
+        UPDATE {TABLE} SET body = new.text WHERE rowid = new.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_delete
+    AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_comment_search_insert
+    AFTER INSERT ON posts_comment
+    WHEN new.post_id IS NOT NULL
+    BEGIN
+        INSERT INTO {TABLE} (rowid, body, post_id, comment_id)
+        VALUES (new.id * 2 + 1, new.text, new.post_id, new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_comment_search_update
+    AFTER UPDATE OF text, post_id ON posts_comment
+    WHEN old.text IS NOT new.text OR old.post_id IS NOT new.post_id
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2 + 1;
+        INSERT INTO {TABLE} (rowid, body, post_id, comment_id)
+        SELECT new.id * 2 + 1, new.text, new.post_id, new.id
+        WHERE new.post_id IS NOT NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_comment_search_delete
+    AFTER DELETE ON posts_comment
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+
+def install_triggers(using=DEFAULT_DB_ALIAS):
+    """Создаёт недостающие триггеры, которые ведут индекс.
+
+    SQLite удаляет триггеры вместе с таблицей, а миграции пересоздают
+    таблицы постов и комментариев при изменении полей, поэтому триггеры
+    восстанавливаются после каждого migrate.
+    """
+    database = connections[using]
+    if TABLE not in database.introspection.table_names():
+        return
+    with database.cursor() as cursor:
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5.
+
+    Все слова обязательны и ищутся по префиксу, чтобы «котик» находил
+    «котики». Операторы FTS5 из запроса не пропускаются.
+    """
+    words = WORD.findall(query.lower())[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def ranked(expression, key=None, limit=None, reverse=False):
+    """Посты, подходящие под запрос, по убыванию релевантности.
+
+    Возвращает кортежи (post_id, score, rowid): score — лучший BM25
+    среди строк поста и его комментариев (меньше — релевантнее),
+    rowid — строка индекса, из которой брать фрагмент. key —
+    (score, post_id), за которым продолжать выдачу; reverse — идти
+    от конца выдачи к началу.
+    """
+    params = [COMMENT_WEIGHT, expression]
+    beyond, order = ('<', '>'), 'score DESC, post_id'
+    if not reverse:
+        beyond, order = ('>', '<'), 'score, post_id DESC'
+    where = ''
+    if key is not None:
+        where = (f'WHERE score {beyond[0]} %s '
+                 f'OR (score = %s AND post_id {beyond[1]} %s)')
+        score, post_id = key
+        params += [score, score, post_id]
+    sql = (
+        'SELECT post_id, score, rowid FROM ('
+        ' SELECT post_id, rowid, MIN(rank * CASE WHEN comment_id IS NULL'
+        '  THEN 1 ELSE %s END) AS score'
+        f' FROM {TABLE} WHERE {TABLE} MATCH %s GROUP BY post_id'
+        f') {where} ORDER BY {order}'
+    )
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def snippets(expression, rowids):
+    """Фрагменты строк индекса с подсвеченными совпадениями."""
+    if not rowids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(rowids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'AND rowid IN ({placeholders})',
+            [MARK_OPEN, MARK_CLOSE, '…', SNIPPET_TOKENS, expression,
+             *rowids],
+        )
+        return {rowid: highlight(text) for rowid, text in cursor.fetchall()}
+
+
+def highlight(text):
+    """Экранирует фрагмент и размечает совпадения тегом <mark>."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_OPEN, '<mark>')
+        .replace(MARK_CLOSE, '</mark>')
+    )
+
+
+def matching_posts(expression):
+    """Подзапрос id постов, в тексте которых есть совпадение."""
+    return RawSQL(
+        f'SELECT post_id FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND comment_id IS NULL',
+        (expression,),
+    )
@@ -0,0 +1,119 @@
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from . import cache, counters, images, search, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(pre_save, sender=Post)
+def post_regrouped(sender, instance, raw=False, **kwargs):
+    """При смене группы пост пропадает из ленты прежней группы."""
+    if raw or instance.pk is None:
+        return
+    old_group_id = (Post.objects
+                    .filter(pk=instance.pk)
+                    .values_list('group_id', flat=True)
+                    .first())
+    if old_group_id and old_group_id != instance.group_id:
+        cache.bump(('group', old_group_id))
+
+
+@receiver(pre_save, sender=Post)
+def post_image_described(sender, instance, raw=False, **kwargs):
+    """Загруженная картинка уменьшается, а сведения о ней пишутся в пост.
+
+    Файл называется по хэшу содержимого; одинаковые загрузки хранятся
+    одним файлом.
+    """
+    if raw:
+        return
+    if not instance.image:
+        images.forget(instance)
+    elif not instance.image._committed:
+        images.optimize_upload(instance.image)
+        for field, value in images.describe(instance.image).items():
+            setattr(instance, field, value)
+        images.place(
+            instance.image, instance.image_hash, instance.image_format
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков и счётчик автора."""
+    if created:
+        follower_ids = timeline.fan_out(instance)
+        counters.bump_user(instance.author_id, posts_count=1)
+    else:
+        follower_ids = timeline.followers(instance.author_id)
+    cache.bump(*cache.post_scopes(instance.author_id, instance.group_id),
+               *cache.follow_scopes(follower_ids))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    cache.bump(*cache.post_scopes(instance.author_id, instance.group_id),
+               *cache.follow_scopes(timeline.followers(instance.author_id)))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Ленты комментариев не выводят, поэтому их кэш не сбрасывается."""
+    if created and instance.post_id:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(pre_save, sender=Group)
+def group_moved(sender, instance, raw=False, **kwargs):
+    """При смене адреса группа не должна открываться по старому."""
+    if raw or instance.pk is None:
+        return
+    old_slug = (Group.objects
+                .filter(pk=instance.pk)
+                .values_list('slug', flat=True)
+                .first())
+    if old_slug and old_slug != instance.slug:
+        cache.forget_groups(old_slug)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Название и адрес группы выводятся во всех лентах."""
+    cache.bump(cache.GROUPS, ('group', instance.pk))
+    cache.forget_groups(instance.slug)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """При подписке в ленту добавляются последние посты автора."""
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+    cache.bump(('follow', instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """При отписке посты автора убираются из ленты."""
+    timeline.prune(instance.user_id, instance.author_id)
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    cache.bump(('follow', instance.user_id))
+
+
+@receiver(post_migrate)
+def search_triggers(sender, using, **kwargs):
+    """Возвращает триггеры поиска, если миграция пересоздала таблицы."""
+    if sender.label == 'posts':
+        search.install_triggers(using)
@@ -0,0 +1,17 @@
+from django import template
+
+from posts import cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_version(*scope):
+    """Версия кэша ленты, меняется при правке постов и групп."""
+    return cache.version(*scope)
+
+
+@register.simple_tag
+def follow_version(user_id):
+    """Версия кэша ленты подписок пользователя."""
+    return cache.follow_version(user_id)
@@ -0,0 +1,34 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(post, geometry, css_class='', **options):
+    """Адаптивная картинка поста: <picture> с WebP и srcset по ширине.
+
+    Браузер сам выбирает вариант под ширину экрана и плотность
+    пикселей; старые браузеры получают обычную миниатюру geometry.
+    Тег только строит адреса, картинки считает представление resize;
+    данные, подготовленные prefetch_pictures, берутся готовыми.
+    """
+    key = thumbnails.spec_key(geometry, options)
+    pictures = getattr(post, '_pictures', {})
+    if key in pictures:
+        picture = pictures[key]
+    else:
+        picture = thumbnails.picture(post, geometry, options)
+    return {'picture': picture, 'css_class': css_class}
+
+
+@register.simple_tag
+def prefetch_pictures(posts, geometry, **options):
+    """Готовит картинки всех постов страницы для post_picture.
+
+    Ставится внутри {% cache %}: при попадании в кэш ничего не
+    считается.
+    """
+    thumbnails.prefetch(posts, geometry, options)
+    return ''
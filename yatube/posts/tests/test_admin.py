@@ -0,0 +1,192 @@
+import warnings
+
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..paginators import EstimatedCountPaginator
+
+
+class ChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, number):
+        for index in range(number):
+            post = Post.objects.create(
+                text=f'Пост {index}', author=self.admin, group=self.group
+            )
+            Comment.objects.create(
+                post=post, author=self.admin, text=f'Комментарий {index}'
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк."""
+        for name in ('admin:posts_post_changelist',
+                     'admin:posts_comment_changelist'):
+            with self.subTest(changelist=name):
+                url = reverse(name)
+                self.create_posts(2)
+                few, _ = self.count_queries(url)
+                self.create_posts(10)
+                many, _ = self.count_queries(url)
+                self.assertEqual(few, many)
+
+    def test_group_editor_does_not_list_groups(self):
+        """В строках нет <select> со всеми группами."""
+        self.create_posts(3)
+        _, response = self.count_queries(
+            reverse('admin:posts_post_changelist')
+        )
+        content = response.content.decode()
+        self.assertNotIn(self.other.title, content)
+        self.assertIn('value="group"', content)
+
+    def test_group_is_edited_by_slug(self):
+        """Группа поста меняется вводом адреса в списке."""
+        post = Post.objects.create(
+            text='Пост', author=self.admin, group=self.group
+        )
+        data = {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-0-id': str(post.pk),
+            'form-0-group': 'other',
+            '_save': 'Сохранить',
+        }
+        self.client.post(reverse('admin:posts_post_changelist'), data)
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.other)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for number in range(5):
+            Post.objects.create(text=f'text{number}', author=cls.author)
+
+    def test_small_tables_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Post.objects.order_by('-pk'), 2)
+        self.assertEqual(paginator.count, 5)
+
+    def test_large_tables_are_estimated(self):
+        """Сверх exact_limit число строк оценивается по id."""
+        Post.objects.filter(text='text1').delete()
+        paginator = EstimatedCountPaginator(Post.objects.order_by('-pk'), 2)
+        paginator.exact_limit = 2
+        newest = Post.objects.latest('pk').pk
+        self.assertEqual(paginator.count, newest)
+
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(author=self.author).order_by('-pk'), 2
+        )
+        filtered.exact_limit = 2
+        self.assertEqual(filtered.count, 3)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            username='leo', email='tolstoy@example.com',
+            first_name='Лев', last_name='Толстой',
+        )
+        User.objects.create_user(username='lev')
+        User.objects.create_user(username='ivan')
+        cls.group = Group.objects.create(
+            title='Котики', slug='cats', description='Описание'
+        )
+        Group.objects.create(
+            title='Собаки', slug='dogs', description='Описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def autocomplete(self, name, term):
+        response = self.client.get(reverse(name), {'term': term})
+        return [item['text'] for item in response.json()['results']]
+
+    def test_users_by_username_prefix(self):
+        self.assertEqual(
+            self.autocomplete('admin:auth_user_autocomplete', 'Le'),
+            ['leo', 'lev'],
+        )
+
+    def test_users_by_name_or_email_prefix(self):
+        for term in ('толст', 'tolstoy@', 'Лев'):
+            with self.subTest(term=term):
+                self.assertEqual(
+                    self.autocomplete('admin:auth_user_autocomplete', term),
+                    ['leo'],
+                )
+
+    def test_groups_by_title_or_slug_prefix(self):
+        for term in ('кот', 'cat'):
+            with self.subTest(term=term):
+                self.assertEqual(
+                    self.autocomplete('admin:posts_group_autocomplete', term),
+                    ['Котики'],
+                )
+
+    def test_posts_newest_first(self):
+        """Автодополнение постов листает их по порядку, новые первыми."""
+        for text in ('Первый', 'Второй'):
+            Post.objects.create(text=text, author=self.author)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            self.assertEqual(
+                self.autocomplete('admin:posts_post_autocomplete', ''),
+                ['Второй', 'Первый'],
+            )
+
+    def test_change_forms_do_not_list_tables(self):
+        """Формы не выводят всех пользователей и все группы."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.admin, author=self.author)
+        urls = (
+            reverse('admin:posts_post_change', args=(post.pk,)),
+            reverse('admin:posts_comment_change', args=(comment.pk,)),
+            reverse('admin:posts_follow_change', args=(follow.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertIn('admin-autocomplete', content)
+                self.assertNotIn('>ivan<', content)
+                self.assertNotIn('>Собаки<', content)
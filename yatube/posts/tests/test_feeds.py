@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.nplusone import no_n_plus_one
+
+from .. import feeds
+from ..models import Comment, Follow, Group, Post, User
+from .test_query_budgets import QUERY_BUDGETS
+
+
+@override_settings(TEMPLATE_QUERYSET_GUARD='raise')
+class FeedQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.create_posts(1)
+
+    @classmethod
+    def create_posts(cls, number):
+        for index in range(number):
+            group = Group.objects.create(
+                title=f'Группа {index}', slug=f'group-{index}-{number}',
+                description='Описание',
+            )
+            post = Post.objects.create(
+                text=f'Пост {index}', author=cls.author, group=group
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {index}'
+            )
+        return post
+
+    def urls(self):
+        post = Post.objects.earliest('pk')
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=(post.group.slug,)
+            ),
+            'posts:profile': reverse(
+                'posts:profile', args=(self.author.username,)
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=(post.pk,)
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:search': reverse('posts:search') + '?q=Пост',
+        }
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_pages_fit_query_budget(self):
+        """Число запросов страниц не растёт с числом постов на них."""
+        guest = Client()
+        user = Client()
+        user.force_login(self.reader)
+        clients = (guest, user)
+        few = {
+            name: [
+                budget and self.count_queries(client, url)
+                for client, budget in zip(clients, QUERY_BUDGETS[name])
+            ]
+            for name, url in self.urls().items()
+        }
+        self.create_posts(10)
+        for name, url in self.urls().items():
+            for client, budget, before in zip(
+                clients, QUERY_BUDGETS[name], few[name]
+            ):
+                if budget is None:
+                    continue
+                with self.subTest(page=name, client=client is user):
+                    queries = self.count_queries(client, url)
+                    self.assertEqual(queries, before)
+                    self.assertLessEqual(queries, budget)
+
+    def test_pages_have_no_n_plus_one(self):
+        self.create_posts(5)
+        user = Client()
+        user.force_login(self.reader)
+        for client in (Client(), user):
+            for name, url in self.urls().items():
+                with self.subTest(page=name, client=client is user):
+                    cache.clear()
+                    with no_n_plus_one():
+                        client.get(url)
+
+    def test_cards_do_not_load_unused_columns(self):
+        post = feeds.posts().get(pk=self.post.pk)
+        deferred = post.get_deferred_fields()
+        self.assertIn('image_hash', deferred)
+        self.assertNotIn('text', deferred)
+        self.assertEqual(post.author.get_full_name(), 'Лев Толстой')
+        with self.assertNumQueries(0):
+            post.group.slug
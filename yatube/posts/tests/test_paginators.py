@@ -0,0 +1,152 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Post, User
+from ..paginators import CursorPaginator, MergePaginator, decode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+
+    TEST_ALL_POSTS: int = 12
+    PER_PAGE: int = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='NoName')
+        for number in range(cls.TEST_ALL_POSTS):
+            Post.objects.create(text=f'text{number}', author=cls.author)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def paginate(self, cursor=None, number=None):
+        paginator = CursorPaginator(Post.objects.all(), self.PER_PAGE)
+        return paginator.get_page(number, cursor=cursor)
+
+    def test_walk_forward_and_back(self):
+        """Курсоры обходят ленту вперёд и назад без пропусков."""
+        first = self.paginate()
+        second = self.paginate(first.paginator.next_cursor)
+        third = self.paginate(second.paginator.next_cursor)
+        self.assertEqual(
+            list(first) + list(second) + list(third), self.expected
+        )
+        self.assertFalse(first.has_previous())
+        self.assertTrue(second.has_previous())
+        self.assertTrue(second.has_next())
+        self.assertFalse(third.has_next())
+
+        back = self.paginate(third.paginator.previous_cursor)
+        self.assertEqual(list(back), list(second))
+
+    def test_last_cursor(self):
+        """Курсор последней страницы отдаёт самые старые посты."""
+        first = self.paginate()
+        last = self.paginate(first.paginator.last_cursor)
+        self.assertEqual(list(last), self.expected[-self.PER_PAGE:])
+        self.assertFalse(last.has_next())
+
+    def test_stable_under_inserts(self):
+        """Новый пост не сдвигает следующую страницу."""
+        first = self.paginate()
+        Post.objects.create(text='новый', author=self.author)
+        second = self.paginate(first.paginator.next_cursor)
+        self.assertEqual(
+            list(second), self.expected[self.PER_PAGE:self.PER_PAGE * 2]
+        )
+
+    def test_no_count_query(self):
+        """Курсорная страница не выполняет COUNT(*)."""
+        first = self.paginate()
+        with self.assertNumQueries(1):
+            self.paginate(first.paginator.next_cursor)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        self.assertEqual(decode_cursor('garbage'), (None, None))
+        page = self.paginate('garbage')
+        self.assertEqual(list(page), self.expected[:self.PER_PAGE])
+        self.assertEqual(page.paginator.cursor, '')
+
+    def test_legacy_page_number(self):
+        """Старые ссылки ?page= продолжают работать."""
+        page = self.paginate(number=2)
+        self.assertEqual(
+            list(page), self.expected[self.PER_PAGE:self.PER_PAGE * 2]
+        )
+        after = self.paginate(page.paginator.next_cursor)
+        self.assertEqual(list(after), self.expected[self.PER_PAGE * 2:])
+
+    def test_view_follows_cursor(self):
+        """Страница index принимает ?cursor=."""
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].paginator.next_cursor
+        response = client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.expected[self.PER_PAGE:self.PER_PAGE * 2],
+        )
+
+
+class MergePaginatorTests(TestCase):
+
+    PER_PAGE: int = 4
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for number in range(11):
+            Post.objects.create(
+                text=f'text{number}', author=authors[number % 3]
+            )
+        Post.objects.create(text='чужой', author=cls.stranger)
+        # Одинаковые даты у разных авторов проверяют порядок по id.
+        same_date = Post.objects.order_by('pub_date').first().pub_date
+        Post.objects.filter(text__in=['text4', 'text5']).update(
+            pub_date=same_date
+        )
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.authors = Follow.objects.filter(
+            user=cls.reader
+        ).values('author_id')
+        cls.expected = list(
+            Post.objects
+            .filter(author_id__in=cls.authors)
+            .order_by('-pub_date', '-id')
+        )
+
+    def paginate(self, cursor=None):
+        paginator = MergePaginator(
+            Post.objects.all(), self.PER_PAGE, authors=self.authors
+        )
+        return paginator.get_page(cursor=cursor)
+
+    def test_merge_matches_query(self):
+        """Слияние потоков даёт тот же порядок, что и author_id__in."""
+        pages = [self.paginate()]
+        while pages[-1].has_next():
+            pages.append(self.paginate(pages[-1].paginator.next_cursor))
+        merged = [post for page in pages for post in page]
+        self.assertEqual(merged, self.expected)
+
+        back = self.paginate(pages[-1].paginator.previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_follow_index_engines(self):
+        """Все движки ленты подписок отдают одинаковую первую страницу."""
+        client = Client()
+        client.force_login(self.reader)
+        for engine in ('timeline', 'merge', 'query'):
+            with self.subTest(engine=engine):
+                with self.settings(FOLLOW_FEED_ENGINE=engine):
+                    response = client.get(reverse('posts:follow_index'))
+                self.assertEqual(
+                    list(response.context['page_obj']), self.expected[:5]
+                )
@@ -0,0 +1,228 @@
+import os
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from faker import Faker
+
+from about import urls as about_urls
+from core.nplusone import no_n_plus_one
+from users import urls as users_urls
+
+from .. import urls as posts_urls
+from ..models import Comment, Follow, Group, Post, User
+from .utils import make_image
+
+# Сколько SQL-запросов делает страница: (для гостя, для вошедшего
+# пользователя); второе число включает чтение сессии и пользователя.
+# Гость на страницах только для вошедших получает перенаправление на
+# вход, и его запросы тоже считаются; None — страницу не проверять.
+# Ленты держат бюджет при любом числе постов на них (test_feeds).
+QUERY_BUDGETS = {
+    'posts:index': (1, 3),
+    'posts:group_list': (2, 4),
+    'posts:profile': (2, 5),
+    'posts:post_detail': (2, 4),
+    'posts:follow_index': (None, 3),
+    'posts:search': (3, 5),
+    'posts:post_create': (0, 3),
+    'posts:post_edit': (0, 5),
+    'posts:add_comment': (0, 3),
+    # Подписка переносит посты автора в ленту читателя.
+    'posts:profile_follow': (0, 12),
+    'posts:profile_unfollow': (0, 8),
+    'users:logout': (0, 4),
+    'users:signup': (0, 2),
+    'users:login': (0, 2),
+    'users:password_change_form': (0, 2),
+    'users:password_change_done': (0, 2),
+    'users:password_reset_form': (0, 2),
+    'users:password_reset_done': (0, 2),
+    'users:password_reset_confirm': (5, 5),
+    'users:password_reset_complete': (0, 2),
+    'about:author': (0, 2),
+    'about:tech': (0, 2),
+}
+
+# Предел суммарного времени SQL одной страницы, секунд, из
+# YATUBE_SQL_TIME_BUDGET. Время зависит от машины, поэтому проверка
+# включается только явно: на стенде с известной скоростью.
+SQL_TIME_BUDGET = float(os.environ.get('YATUBE_SQL_TIME_BUDGET', 0)) or None
+
+# Страницы, меняющие данные: их меряют отдельные тесты, каждый со
+# своим исходным состоянием.
+STATE_CHANGING = ('posts:profile_follow', 'posts:profile_unfollow')
+
+
+def url_names():
+    """Имена всех адресов posts, users и about."""
+    return [
+        f'{module.app_name}:{pattern.name}'
+        for module in (posts_urls, users_urls, about_urls)
+        for pattern in module.urlpatterns
+    ]
+
+
+class QueryBudgetTests(TestCase):
+    """Бюджет SQL каждой страницы на данных, похожих на настоящие.
+
+    Авторов, групп, постов и комментариев много больше, чем влезает
+    на страницу; у части постов есть картинки, у читателя — подписки.
+    Лишний запрос на каждый пост здесь превышает бюджет страницы.
+    """
+
+    AUTHORS = 20
+    GROUPS = 6
+    POSTS = 120
+    COMMENTS = 240
+    IMAGES = 8
+
+    @classmethod
+    def setUpClass(cls):
+        # Каталог создаётся здесь, а не при импорте: модуль импортируют
+        # другие тесты ради QUERY_BUDGETS.
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            RESIZE_CACHE_DIR=os.path.join(cls.media_root, 'resize'),
+        )
+        cls.media.enable()
+        super().setUpClass()
+        fake = Faker('ru_RU')
+        fake.seed_instance(2022)
+        choice = random.Random(2022).choice
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name=fake.first_name(), last_name=fake.last_name(),
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'{fake.user_name()}{index}',
+                first_name=fake.first_name(), last_name=fake.last_name(),
+            )
+            for index in range(cls.AUTHORS)
+        ]
+        groups = [
+            Group.objects.create(
+                title=fake.catch_phrase()[:200], slug=f'group-{index}',
+                description=fake.paragraph(),
+            )
+            for index in range(cls.GROUPS)
+        ]
+        for author in authors[::2]:
+            Follow.objects.create(user=cls.reader, author=author)
+        posts = [
+            Post.objects.create(
+                text=fake.paragraph(nb_sentences=6),
+                author=choice(authors), group=choice(groups + [None]),
+                image=make_image() if index < cls.IMAGES else '',
+            )
+            for index in range(cls.POSTS)
+        ]
+        cls.post = Post.objects.create(
+            text=fake.paragraph(), author=cls.reader, group=groups[0],
+            image=make_image(),
+        )
+        for _ in range(cls.COMMENTS):
+            Comment.objects.create(
+                post=choice(posts + [cls.post]),
+                author=choice(authors + [cls.reader]),
+                text=fake.sentence(),
+            )
+        cls.author = authors[1]
+        cls.group = groups[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def url(self, name):
+        """Адрес страницы name с аргументами из засеянных данных."""
+        post = (self.post.pk,)
+        args = {
+            'posts:group_list': (self.group.slug,),
+            'posts:profile': (self.author.username,),
+            'posts:post_detail': post,
+            'posts:post_edit': post,
+            'posts:add_comment': post,
+            'posts:profile_follow': (self.author.username,),
+            'posts:profile_unfollow': (self.author.username,),
+            'users:password_reset_confirm': (
+                urlsafe_base64_encode(force_bytes(self.reader.pk)),
+                default_token_generator.make_token(self.reader),
+            ),
+        }.get(name, ())
+        url = reverse(name, args=args)
+        if name == 'posts:search':
+            url += '?q=' + self.post.text.split()[0]
+        return url
+
+    def measure(self, url, user):
+        """Число запросов и время SQL страницы с холодным кэшем."""
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            with no_n_plus_one():
+                response = client.get(url)
+        self.assertLess(response.status_code, 400)
+        queries = context.captured_queries
+        return len(queries), sum(float(query['time']) for query in queries)
+
+    def test_every_url_has_budget(self):
+        for name in url_names():
+            with self.subTest(url=name):
+                self.assertEqual(len(QUERY_BUDGETS[name]), 2)
+
+    def assertFitsBudget(self, name, user, budget):
+        queries, seconds = self.measure(self.url(name), user)
+        self.assertLessEqual(queries, budget)
+        if SQL_TIME_BUDGET is not None:
+            self.assertLessEqual(seconds, SQL_TIME_BUDGET)
+
+    def test_pages_fit_budget(self):
+        for name in url_names():
+            if name in STATE_CHANGING:
+                continue
+            budgets = QUERY_BUDGETS[name]
+            for user, budget in zip((None, self.reader), budgets):
+                if budget is None:
+                    continue
+                with self.subTest(url=name, user=user):
+                    self.assertFitsBudget(name, user, budget)
+
+    def test_follow_fits_budget(self):
+        """Подписка на автора, на которого читатель не подписан."""
+        name = 'posts:profile_follow'
+        self.assertFalse(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        guest_budget, budget = QUERY_BUDGETS[name]
+        self.assertFitsBudget(name, None, guest_budget)
+        self.assertFitsBudget(name, self.reader, budget)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+
+    def test_unfollow_fits_budget(self):
+        """Отписка от автора, на которого читатель подписан."""
+        name = 'posts:profile_unfollow'
+        Follow.objects.create(user=self.reader, author=self.author)
+        guest_budget, budget = QUERY_BUDGETS[name]
+        self.assertFitsBudget(name, None, guest_budget)
+        self.assertFitsBudget(name, self.reader, budget)
+        self.assertFalse(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
@@ -0,0 +1,109 @@
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.cats = Post.objects.create(
+            text='Котики спят весь день', author=cls.user
+        )
+        cls.dogs = Post.objects.create(
+            text='Собаки гуляют во дворе', author=cls.user
+        )
+        Comment.objects.create(
+            post=cls.dogs, author=cls.user, text='А котик смотрит в окно'
+        )
+
+    def search(self, query, cursor=None):
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        return Client().get(reverse('posts:search'), data)
+
+    def test_ranking_and_snippets(self):
+        """Совпадение в посте выше совпадения в комментарии."""
+        response = self.search('КОТИК')
+        page = list(response.context['page_obj'])
+        self.assertEqual(page, [self.cats, self.dogs])
+        self.assertIn('<mark>Котики</mark>', page[0].snippet)
+        self.assertIn('<mark>котик</mark>', page[1].snippet)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов и комментариев."""
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Собаки и попугаи'
+        dogs.save()
+        self.assertEqual(
+            list(self.search('попугаи').context['page_obj']), [dogs]
+        )
+        Comment.objects.filter(post=dogs).delete()
+        self.assertEqual(
+            list(self.search('котик').context['page_obj']), [self.cats]
+        )
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(list(self.search('котик').context['page_obj']), [])
+
+    def test_triggers_restored_after_migrate(self):
+        """Триггеры, потерянные при пересоздании таблицы, восстанавливаются."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_search_insert')
+        emit_post_migrate_signal(0, False, connection.alias)
+        post = Post.objects.create(text='Попугаи кричат', author=self.user)
+        self.assertEqual(
+            list(self.search('попугаи').context['page_obj']), [post]
+        )
+
+    def test_markup_is_escaped(self):
+        """Текст поста в фрагменте экранируется."""
+        Post.objects.create(text='<script>котики</script>', author=self.user)
+        content = self.search('котики').content.decode()
+        self.assertNotIn('<script>', content)
+        self.assertIn('&lt;script&gt;', content)
+
+    def test_cursor_pagination(self):
+        """Курсоры обходят выдачу без пропусков и повторов."""
+        posts = [
+            Post.objects.create(text=f'попугай номер {number}',
+                                author=self.user)
+            for number in range(7)
+        ]
+        first = self.search('попугай').context['page_obj']
+        second = self.search(
+            'попугай', first.paginator.next_cursor
+        ).context['page_obj']
+        self.assertTrue(first.has_next())
+        self.assertFalse(second.has_next())
+        self.assertCountEqual(list(first) + list(second), posts)
+
+        back = self.search(
+            'попугай', second.paginator.previous_cursor
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_empty_query(self):
+        """Пустой запрос или запрос из символов ничего не ищет."""
+        for query in ('', '"*()'):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
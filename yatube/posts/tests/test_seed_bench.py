@@ -0,0 +1,75 @@
+import re
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from .. import images
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class SeedBenchTests(TestCase):
+    OPTIONS = {
+        'users': 60,
+        'groups': 8,
+        'posts': 400,
+        'comments': 300,
+        'follows': 500,
+        'images': 0.1,
+        'distinct_images': 2,
+        'batch_size': 64,
+        'workers': 2,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        with override_settings(MEDIA_ROOT=cls.media_root):
+            call_command('seed_bench', stdout=StringIO(), **cls.OPTIONS)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_creates_requested_rows(self):
+        self.assertEqual(User.objects.count(), self.OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), self.OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), self.OPTIONS['posts'])
+        self.assertEqual(Comment.objects.count(), self.OPTIONS['comments'])
+        # Повторы и подписки на себя отбрасываются.
+        self.assertLessEqual(Follow.objects.count(), self.OPTIONS['follows'])
+        self.assertGreater(Follow.objects.count(), 0)
+
+    def test_dates_are_spread(self):
+        dates = Post.objects.values('pub_date').distinct().count()
+        self.assertGreater(dates, self.OPTIONS['posts'] // 2)
+
+    def test_followers_are_skewed(self):
+        followers = sorted(
+            Follow.objects.values('author').annotate(total=Count('pk'))
+            .values_list('total', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+
+    def test_derived_data_is_consistent(self):
+        post = Post.objects.filter(comments_count__gt=0).first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        user = Follow.objects.first().user
+        self.assertEqual(user.stats.following_count, user.follower.count())
+        self.assertTrue(TimelineEntry.objects.filter(user=user).exists())
+
+    def test_images_use_sharded_layout(self):
+        names = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        self.assertTrue(names)
+        self.assertLessEqual(len(names), self.OPTIONS['distinct_images'])
+        for name in names:
+            self.assertRegex(name, re.compile(images.SHARDED_NAME))
@@ -0,0 +1,434 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image, features
+
+from core.thumbnail import resize as resizer
+
+from .. import images, thumbnails
+from ..management.commands import shard_images
+from ..models import Post, User
+from .utils import make_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+TEMP_RESIZE_DIR = os.path.join(TEMP_MEDIA_ROOT, 'resize')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   RESIZE_CACHE_DIR=TEMP_RESIZE_DIR)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_RESIZE_DIR, ignore_errors=True)
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def thumbnail_files(self):
+        found = []
+        for root, _, files in os.walk(TEMP_RESIZE_DIR):
+            found.extend(os.path.join(root, name) for name in files)
+        return found
+
+    def test_create_schedules_generation(self):
+        """После сохранения поста миниатюры уходят в пул процессов."""
+        pool = mock.Mock()
+        with mock.patch.object(thumbnails, 'executor', return_value=pool), \
+                mock.patch.object(thumbnails.transaction, 'on_commit',
+                                  side_effect=lambda callback: callback()):
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'Пост с фото',
+                'image': make_image(),
+            })
+        post = Post.objects.get(text='Пост с фото')
+        pool.submit.assert_called_once_with(
+            thumbnails.generate, post.image.name, 1200
+        )
+
+    def test_pool_spawns_workers(self):
+        """Воркеры пула не наследуют процесс сервера через fork."""
+        with thumbnails.pool(1) as pool:
+            self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+            self.assertEqual(
+                pool.submit(thumbnails.formats).result(timeout=60),
+                thumbnails.formats(),
+            )
+
+    def test_regenerate_command(self):
+        """Команда создаёт миниатюры всех геометрий для всех постов."""
+        for number in range(2):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user, image=make_image()
+            )
+        Post.objects.create(text='Без фото', author=self.user)
+        out = StringIO()
+        call_command('regenerate_thumbnails', '--workers', '0', stdout=out)
+        # Базовая миниатюра и варианты не шире исходника в 1200px.
+        narrow = [width for width in settings.THUMBNAIL_VARIANT_WIDTHS
+                  if width <= 1200]
+        expected = 2 * (1 + len(narrow) * len(thumbnails.formats()))
+        self.assertIn(f'миниатюр готово: {expected} из {expected}',
+                      out.getvalue())
+        self.assertEqual(len(self.thumbnail_files()), expected)
+
+    def test_small_source_gets_no_wide_variants(self):
+        """Для маленького исходника строится только самый узкий вариант,
+        и он не увеличивается."""
+        post = Post.objects.create(
+            text='Маленькое фото', author=self.user,
+            image=make_image(size=(300, 200)),
+        )
+        done = thumbnails.generate(post.image.name, post.image_width)
+        self.assertEqual(done, 1 + len(thumbnails.formats()))
+        for _, _, _, options in thumbnails.variants(
+            '960x339', {'crop': 'center', 'upscale': True}
+        ):
+            self.assertNotIn('upscale', options)
+        sizes = []
+        for path in self.thumbnail_files():
+            with Image.open(path) as image:
+                sizes.append(image.size)
+        self.assertIn((300, 113), sizes)
+        self.assertIn((960, 339), sizes)
+
+    def test_page_does_not_touch_images(self):
+        """Страница только строит адреса копий, не читая картинок."""
+        for number in range(3):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user, image=make_image()
+            )
+        with CaptureQueriesContext(connection) as context, \
+                mock.patch.object(thumbnails.resizer, 'render') as render:
+            content = self.client.get(reverse('posts:index')).content
+        kvstore_queries = [
+            query for query in context.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(kvstore_queries, [])
+        render.assert_not_called()
+        self.assertEqual(content.decode().count('width="960"'), 3)
+        self.assertEqual(self.thumbnail_files(), [])
+
+    def test_pictures_resolved_once_per_page(self):
+        """Варианты картинок считаются один раз на страницу ленты."""
+        for number in range(3):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user, image=make_image()
+            )
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        for page in pages:
+            with self.subTest(page=page), \
+                    mock.patch.object(thumbnails, 'variants',
+                                      wraps=thumbnails.variants) as variants:
+                cache.clear()
+                content = self.client.get(page).content.decode()
+                self.assertEqual(variants.call_count, 1)
+                self.assertEqual(content.count('width="960"'), 3)
+
+    def test_picture_lists_variants(self):
+        """Картинка поста выводится с srcset по ширине."""
+        post = Post.objects.create(
+            text='Широкое фото', author=self.user,
+            image=make_image(size=(2000, 1000)),
+        )
+        content = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        ).content.decode()
+        for width in settings.THUMBNAIL_VARIANT_WIDTHS:
+            self.assertIn(f' {width}w', content)
+        self.assertIn('sizes="(max-width: 960px) 100vw, 960px"', content)
+
+    def test_picture_skips_upscaled_variants(self):
+        """Варианты шире исходника, кроме самого узкого, не выводятся."""
+        post = Post.objects.create(
+            text='Маленькое фото', author=self.user,
+            image=make_image(size=(300, 200)),
+        )
+        picture = thumbnails.picture(
+            post, '960x339', {'crop': 'center', 'upscale': True}
+        )
+        self.assertEqual(picture['img']['width'], 960)
+        self.assertEqual(len(picture['srcset'].split(', ')), 1)
+        self.assertTrue(picture['srcset'].endswith(' 320w'))
+
+    @skipUnless(features.check('webp'), 'Pillow собран без WebP')
+    def test_picture_offers_webp(self):
+        """При поддержке WebP варианты в нём идут в <source>."""
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=make_image()
+        )
+        content = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        ).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+        self.assertIn(',webp/posts/', content)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   RESIZE_CACHE_DIR=TEMP_RESIZE_DIR)
+class SingleFlightTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_RESIZE_DIR, ignore_errors=True)
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Популярный пост', image=make_image(),
+            author=User.objects.create_user(username='popular'),
+        )
+        self.name = self.post.image.name
+        self.spec = resizer.encode(
+            '960x339', {'crop': 'center', 'upscale': True}
+        )
+        key = resizer.cache_key(self.name, self.spec)
+        self.lease = f'{resizer.LEASE_PREFIX}:{key}'
+
+    def render(self):
+        with mock.patch.object(resizer, '_resize',
+                               wraps=resizer._resize) as create:
+            started = time.monotonic()
+            path = resizer.render(self.name, self.spec)
+            elapsed = time.monotonic() - started
+        with Image.open(path) as image:
+            width = image.width
+        return width, elapsed, create.call_count
+
+    def test_lease_is_released(self):
+        width, _, renders = self.render()
+        self.assertEqual((width, renders), (960, 1))
+        self.assertIsNone(cache.get(self.lease))
+
+    def test_waits_for_lease_holder(self):
+        """Пока копию строит другой процесс, повторно её не строят."""
+        cache.add(self.lease, 'other')
+        data = resizer._resize(self.name, *resizer.decode(self.spec))
+
+        def finish():
+            # Владелец аренды кладёт копию в кэш и освобождает аренду.
+            resizer.disk_cache().set(
+                resizer.cache_key(self.name, self.spec), data
+            )
+            cache.delete(self.lease)
+
+        release = threading.Timer(0.2, finish)
+        release.start()
+        width, elapsed, renders = self.render()
+        release.join()
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertEqual((width, renders), (960, 0))
+
+    @override_settings(THUMBNAIL_LEASE_WAIT=0.1)
+    def test_stale_lease_does_not_block_page(self):
+        cache.add(self.lease, 'crashed')
+        with self.assertLogs('core.thumbnail.lease', 'WARNING'):
+            width, _, renders = self.render()
+        self.assertEqual((width, renders), (960, 1))
+        self.assertEqual(cache.get(self.lease), 'crashed')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_metadata_saved_on_upload(self):
+        """При загрузке в пост записываются размеры, формат и хэш."""
+        upload = make_image('photo.png', (300, 200), 'PNG')
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой', 'image': upload,
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_format),
+            (300, 200, 'PNG'),
+        )
+        with post.image.open('rb') as stored:
+            content = stored.read()
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(post.image_hash, hashlib.sha256(content).hexdigest())
+
+        detail = client.get(reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(detail, '300×200')
+
+    def test_upload_is_optimized(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет метаданные."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.effect_noise((3000, 1000), 64).convert('RGB').save(
+            buffer, 'JPEG', quality=98, exif=exif.tobytes()
+        )
+        upload = SimpleUploadedFile('phone.jpg', buffer.getvalue(),
+                                    content_type='image/jpeg')
+        with self.assertLogs('posts.images', 'INFO') as logs:
+            post = Post.objects.create(
+                text='Фото', author=self.user, image=upload
+            )
+        self.assertIn('сэкономлено', logs.output[0])
+        self.assertEqual((post.image_width, post.image_height), (683, 2048))
+        self.assertLess(post.image_size, len(buffer.getvalue()))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (683, 2048))
+            self.assertNotIn('exif', stored.info)
+
+    def test_describe_command(self):
+        """Команда заполняет сведения о ранее загруженных картинках."""
+        post = Post.objects.create(
+            text='Старый пост', author=self.user, image=make_image()
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_size=None,
+            image_format='', image_hash='',
+        )
+        Post.objects.create(
+            text='Потерянный файл', author=self.user, image='posts/none.jpg'
+        )
+        out = StringIO()
+        call_command('describe_images', stdout=out)
+        self.assertIn('Описано картинок: 1, не удалось прочитать: 1',
+                      out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_format),
+                         (1200, 'JPEG'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardedLayoutTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='sharded')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_upload_is_named_by_hash(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=make_image()
+        )
+        digest = post.image_hash
+        self.assertEqual(
+            post.image.name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_identical_uploads_share_file(self):
+        first, second = (
+            Post.objects.create(
+                text=name, author=self.user,
+                image=make_image(name, color=(1, 2, 3)),
+            )
+            for name in ('first.jpg', 'second.jpg')
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.path)],
+        )
+
+    def test_shard_command(self):
+        """Команда переносит старые файлы и продолжает с места обрыва."""
+        names = []
+        for number in range(3):
+            name = f'posts/old_{number}.jpg'
+            with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as file:
+                file.write(make_image().read())
+            names.append(name)
+        for name in names + [names[0], 'posts/lost.jpg']:
+            Post.objects.create(text=name, author=self.user, image=name)
+        Post.objects.update(image_hash='', image_format='')
+
+        out = StringIO()
+        call_command('shard_images', '--batch-size', '2', stdout=out)
+        self.assertIn('Перенесено картинок: 4, из них дубликатов: 1, '
+                      'файлов не найдено: 1, удалено старых файлов: 0',
+                      out.getvalue())
+        posts = Post.objects.exclude(text='posts/lost.jpg')
+        for post in posts:
+            self.assertRegex(post.image.name, images.SHARDED_NAME)
+            self.assertTrue(os.path.exists(post.image.path))
+        for name in names:
+            self.assertFalse(
+                os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+            )
+        first_copies = posts.filter(text=names[0])
+        self.assertEqual(first_copies.values('image').distinct().count(), 1)
+
+        out = StringIO()
+        call_command('shard_images', stdout=out)
+        self.assertIn('Перенесено картинок: 0', out.getvalue())
+
+    def test_shard_command_resumes_after_crash(self):
+        """Файлы, которые обрыв оставил без ссылок, удаляет повторный
+        запуск."""
+        names = []
+        for number in range(2):
+            name = f'posts/crashed_{number}.jpg'
+            with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as file:
+                file.write(make_image(color=(number, 7, 7)).read())
+            Post.objects.create(text=name, author=self.user, image=name)
+            names.append(name)
+        Post.objects.update(image_hash='', image_format='')
+
+        with mock.patch.object(shard_images.Command, 'delete',
+                               side_effect=RuntimeError('обрыв')):
+            with self.assertRaises(RuntimeError):
+                call_command('shard_images', stdout=StringIO())
+        for post in Post.objects.all():
+            self.assertRegex(post.image.name, images.SHARDED_NAME)
+        for name in names:
+            self.assertTrue(
+                os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+            )
+
+        out = StringIO()
+        call_command('shard_images', stdout=out)
+        self.assertIn('Перенесено картинок: 0', out.getvalue())
+        self.assertIn('удалено старых файлов: 2', out.getvalue())
+        for name in names:
+            self.assertFalse(
+                os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+            )
+        for post in Post.objects.all():
+            self.assertTrue(os.path.exists(post.image.path))
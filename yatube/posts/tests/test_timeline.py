@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def timeline(self):
+        return list(
+            TimelineEntry.objects
+            .filter(user=self.reader)
+            .order_by('-pub_date', '-post_id')
+            .values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка переносит посты автора в ленту, отписка убирает."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline(), [self.old_post.pk])
+
+        follow.delete()
+        self.assertEqual(self.timeline(), [])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.timeline(), [post.pk, self.old_post.pk])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_is_capped(self):
+        """Лента обрезается до TIMELINE_LENGTH."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'text{number}', author=self.author)
+            for number in range(3)
+        ]
+        call_command('rebuild_timelines', '--trim', stdout=StringIO())
+        self.assertEqual(self.timeline(), [posts[2].pk, posts[1].pk])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_fan_out_trims(self):
+        """Публикация обрезает ленту без отдельного запуска --trim."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'text{number}', author=self.author)
+            for number in range(3)
+        ]
+        self.assertEqual(self.timeline(), [posts[2].pk, posts[1].pk])
+
+    def test_fan_out_keeps_every_timeline_capped(self):
+        """После публикации ни одна лента подписчиков не длиннее
+        TIMELINE_LENGTH, даже переросшая раньше."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        with self.settings(TIMELINE_LENGTH=10):
+            for number in range(5):
+                Post.objects.create(text=f'text{number}', author=self.author)
+        with self.settings(TIMELINE_LENGTH=2):
+            newest = Post.objects.create(text='новый', author=self.author)
+        for user in (self.reader, other):
+            with self.subTest(user=user):
+                entries = TimelineEntry.objects.filter(user=user)
+                self.assertEqual(entries.count(), 2)
+                self.assertTrue(entries.filter(post=newest).exists())
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_rebuild_orders_and_truncates(self):
+        """Пересборка берёт TIMELINE_LENGTH новейших постов авторов."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        posts = [
+            Post.objects.create(
+                text=f'text{number}', author=(self.author, other)[number % 2]
+            )
+            for number in range(4)
+        ]
+        Post.objects.create(
+            text='Чужой пост',
+            author=User.objects.create_user(username='stranger'),
+        )
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild(self.reader.pk)
+        self.assertEqual(
+            self.timeline(), [post.pk for post in reversed(posts[1:])]
+        )
+        entry = TimelineEntry.objects.get(post=posts[3])
+        self.assertEqual(entry.pub_date, posts[3].pub_date)
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает потерянную ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', 'reader', stdout=StringIO())
+        self.assertEqual(self.timeline(), [self.old_post.pk])
@@ -1,9 +1,20 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
 from django import forms
-from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Post, Group, User, Follow
+from .. import cache as cache_module
+from ..models import Comment, Post, Group, User, Follow
+
+# Каталог создаёт SQLiteCache при первом обращении, удаляет тест.
+TEMP_CACHE_DIR = os.path.join(
+    tempfile.gettempdir(), f'yatube-tiered-{os.getpid()}'
+)
 
 
 class PostPagesTests(TestCase):
@@ -140,7 +151,8 @@ class PostPagesTests(TestCase):
         )
 
         post_cache_1 = self.guest_client.get(reverse('posts:index')).content
-        post.delete()
+        # Изменение в обход сигналов не сбрасывает кэш.
+        Post.objects.filter(pk=post.pk).update(text='изменённый текст')
 
         post_cache_2 = self.guest_client.get(reverse('posts:index')).content
         self.assertEqual(post_cache_1, post_cache_2)
@@ -149,6 +161,53 @@ class PostPagesTests(TestCase):
         post_cache_3 = self.guest_client.get(reverse('posts:index')).content
         self.assertNotEqual(post_cache_1, post_cache_3)
 
+    def test_cached_feed_skips_page_query(self):
+        """При попадании в кэш лента не читает посты из базы, а новый
+        комментарий кэш не сбрасывает."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.guest_client.get(page)
+                Comment.objects.create(
+                    post=self.post, author=self.user, text='комментарий'
+                )
+                with self.assertNumQueries(0):
+                    self.guest_client.get(page)
+
+    def test_cache_invalidated_by_signals(self):
+        """Кэш лент сбрасывается сразу при изменении постов и групп."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                post = Post.objects.create(
+                    text='пост для удаления',
+                    author=self.user,
+                    group=self.group,
+                )
+                content = self.guest_client.get(page).content.decode()
+                self.assertIn(post.text, content)
+
+                post.delete()
+                content = self.guest_client.get(page).content.decode()
+                self.assertNotIn(post.text, content)
+
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        content = self.guest_client.get(reverse('posts:index')).content
+        self.assertIn(b'/group/new-slug/', content)
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
     def test_follow_page(self):
         """Проверка подписки."""
         # страница подписок пуста
@@ -173,6 +232,61 @@ class PostPagesTests(TestCase):
         response_4 = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response_4.context['page_obj']), 0)
 
+    def test_follow_cache_per_user(self):
+        """Кэш ленты подписок свой у каждого пользователя."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(self.post_author.text, response.content.decode())
+
+        response = self.authorized_client_author.get(
+            reverse('posts:follow_index')
+        )
+        self.assertNotIn(self.post_author.text, response.content.decode())
+
+        post = Post.objects.create(
+            text='Новый пост автора', author=self.user_author
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post.text, response.content.decode())
+
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_author},
+            )
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(post.text, response.content.decode())
+
+    def test_follow_cache_invalidated_for_followers_only(self):
+        """Правка поста сбрасывает ленты подписчиков автора, а не всех."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        with self.assertNumQueries(0):
+            cache_module.post_scopes(self.user_author.pk, None)
+
+        post = Post.objects.create(
+            text='Пост до правки', author=self.user_author
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post.text, response.content.decode())
+
+        follower = cache_module.follow_version(self.user.pk)
+        stranger = cache_module.follow_version(self.user_author.pk)
+        post.text = 'Пост после правки'
+        post.save()
+        self.assertNotEqual(
+            cache_module.follow_version(self.user.pk), follower
+        )
+        self.assertEqual(
+            cache_module.follow_version(self.user_author.pk), stranger
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post.text, response.content.decode())
+
+        post.delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(post.text, response.content.decode())
+
     def test_follow_on_user(self):
         """Проверка подписки."""
         count_follow = Follow.objects.count()
@@ -261,3 +375,66 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     self.TEST_SECOND_PAGE_POSTS
                 )
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.tiered.TieredCache',
+        'OPTIONS': {'L2': 'shared', 'POLL_INTERVAL': 0},
+    },
+    'shared': {
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(TEMP_CACHE_DIR, 'default.sqlite3'),
+    },
+})
+class TieredCacheViewsTests(TestCase):
+    """Ленты с кэшами из настроек продакшена: TieredCache над SQLite."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_feeds_invalidated_through_tiered_cache(self):
+        """Правка поста видна на лентах, закэшированных в TieredCache."""
+        self.assertEqual(type(caches['default']).__name__, 'TieredCache')
+        Follow.objects.create(user=self.user, author=User.objects.create(
+            username='author'
+        ))
+        post = Post.objects.create(
+            text='Пост до правки', author=self.user, group=self.group
+        )
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for page in pages:
+            self.assertIn(post.text, self.client.get(page).content.decode())
+
+        post.text = 'Пост после правки'
+        post.save()
+        for page in pages:
+            with self.subTest(page=page):
+                content = self.client.get(page).content.decode()
+                self.assertIn(post.text, content)
+
+        author_post = Post.objects.create(
+            text='Пост автора', author=User.objects.get(username='author')
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(author_post.text, response.content.decode())
@@ -0,0 +1,22 @@
+import itertools
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+# Разный цвет — разное содержимое: одинаковые загрузки хранятся одним
+# файлом.
+COLORS = itertools.count()
+
+
+def make_image(name='photo.jpg', size=(1200, 800), format='JPEG',
+               color=None):
+    """Загружаемая картинка; без color каждая новая отличается цветом."""
+    if color is None:
+        number = next(COLORS)
+        color = (number * 67 % 256, number * 131 % 256, 40)
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type=f'image/{format.lower()}'
+    )
@@ -0,0 +1,221 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+from PIL import Image
+from sorl.thumbnail.helpers import serialize
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.thumbnail import resize as resizer
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def geometries(source_width=None):
+    """Пары (геометрия, опции) всех миниатюр, которые выводит сайт.
+
+    Кроме THUMBNAIL_GEOMETRIES сюда входят их варианты для srcset —
+    только те, что picture() выводит для исходника ширины
+    source_width.
+    """
+    specs = {}
+    for geometry, options in settings.THUMBNAIL_GEOMETRIES:
+        specs.setdefault(spec_key(geometry, options),
+                         (geometry, dict(options)))
+        for _, variant_width, variant, variant_options in variants(
+            geometry, options
+        ):
+            if fits(variant_width, source_width):
+                specs.setdefault(spec_key(variant, variant_options),
+                                 (variant, variant_options))
+    return list(specs.values())
+
+
+def fits(variant_width, source_width):
+    """Выводится ли вариант для исходника ширины source_width.
+
+    Варианты шире исходника не нужны: браузер получит те же пиксели
+    дороже. Самый узкий вариант остаётся всегда, чтобы у srcset был
+    хоть один кандидат. Если ширина неизвестна, нужны все.
+    """
+    narrowest = min(settings.THUMBNAIL_VARIANT_WIDTHS, default=0)
+    return (not source_width or variant_width <= source_width
+            or variant_width == narrowest)
+
+
+def formats():
+    """Форматы вариантов, которые умеет записывать установленный Pillow.
+
+    Pillow, собранный без libwebp, не пишет WebP: тогда варианты
+    создаются только в JPEG.
+    """
+    Image.init()
+    return [
+        format_ for format_ in settings.THUMBNAIL_VARIANT_FORMATS
+        if format_ in Image.SAVE
+    ]
+
+
+def variants(geometry, options):
+    """Варианты миниатюры разной ширины и формата для srcset.
+
+    Возвращает четвёрки (формат, ширина, геометрия, опции); высота
+    меняется пропорционально ширине, чтобы кадрирование совпадало.
+    Варианты не увеличивают исходник: upscale из опций не переносится.
+    Для геометрии без ширины вариантов нет.
+    """
+    width, height = parse_geometry(geometry)
+    if not width:
+        return []
+    options = {
+        key: value for key, value in options.items() if key != 'upscale'
+    }
+    found = []
+    for format_ in formats():
+        for variant_width in settings.THUMBNAIL_VARIANT_WIDTHS:
+            variant = str(variant_width)
+            if height:
+                variant += f'x{round(height * variant_width / width)}'
+            found.append((format_, variant_width, variant,
+                          dict(options, format=format_)))
+    return found
+
+
+def generate(name, source_width=None, force=False):
+    """Создаёт все уменьшенные копии изображения name из хранилища.
+
+    source_width — ширина исходника из поста: варианты шире него не
+    строятся, как их не выводит и picture(). Копии кладутся в
+    дисковый кэш представления resize, уже готовые не пересчитываются;
+    с force они строятся заново. Возвращает число готовых копий.
+    """
+    done = 0
+    for geometry, options in geometries(source_width):
+        try:
+            resizer.render(name, resizer.encode(geometry, options), force)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s для %s',
+                             geometry, name)
+        else:
+            done += 1
+    return done
+
+
+def pool(workers):
+    """Пул процессов для generate.
+
+    Процессы запускаются через spawn, а не fork: fork многопоточного
+    веб-сервера копирует в потомка блокировки, захваченные другими
+    потоками, и соединения с БД родителя. Воркер начинает с чистого
+    интерпретатора и настраивает Django сам (init_worker).
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+
+
+def executor():
+    """Общий для процесса пул воркеров, создаётся при первом обращении."""
+    global _executor
+    if _executor is None:
+        _executor = pool(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def schedule(name, source_width=None):
+    """Ставит создание миниатюр в пул после фиксации транзакции.
+
+    Запрос не ждёт обработки изображения: первый читатель страницы
+    получает уже готовые миниатюры.
+    """
+    if not name or not settings.THUMBNAIL_WORKERS:
+        return
+    transaction.on_commit(lambda: executor().submit(
+        generate, name, source_width
+    ))
+
+
+def init_worker():
+    """Настраивает Django в новом процессе пула.
+
+    generate не обращается к БД, поэтому соединений воркер не
+    открывает.
+    """
+    django.setup()
+
+
+def prefetch(posts, geometry, options):
+    """Готовит picture() для всех постов страницы разом.
+
+    Варианты и форматы, которые умеет Pillow, считаются один раз на
+    страницу, а не на каждую картинку. Результат лежит в
+    post._pictures, откуда его берёт тег post_picture.
+    """
+    specs = variants(geometry, options)
+    key = spec_key(geometry, options)
+    for post in posts:
+        pictures = post.__dict__.setdefault('_pictures', {})
+        pictures[key] = picture(post, geometry, options, specs)
+
+
+def picture(post, geometry, options, specs=None):
+    """Адреса и размеры картинки поста для <picture> или None.
+
+    Возвращает словарь: img — адрес и размеры копии geometry для
+    <img> (размеры резервируют место на странице), srcset — варианты
+    в последнем из форматов, sources — [(MIME-тип, srcset)] для
+    остальных форматов, sizes — подсказка браузеру о ширине. Варианты
+    шире исходника пропускаются, кроме самого узкого. Строятся только
+    подписанные адреса /resize/: ни исходник, ни миниатюры при
+    этом не читаются, размеры берутся из полей поста. specs —
+    готовый variants(geometry, options), его передаёт prefetch().
+    """
+    if not post.image:
+        return None
+    name = post.image.name
+    source = None
+    if post.image_width:
+        source = post.image_width, post.image_height
+    width, height = resizer.output_size(source, geometry, options) or (
+        None, None
+    )
+    srcsets = {}
+    if specs is None:
+        specs = variants(geometry, options)
+    for format_, variant_width, variant, variant_options in specs:
+        if not fits(variant_width, source and source[0]):
+            continue
+        srcsets.setdefault(format_, []).append(
+            f'{resizer.url(name, variant, variant_options)} {variant_width}w'
+        )
+    srcset = ''
+    if srcsets:
+        *others, (_, last) = srcsets.items()
+        srcset = ', '.join(last)
+    else:
+        others = []
+    layout_width = width or parse_geometry(geometry)[0]
+    return {
+        'img': {
+            'url': resizer.url(name, geometry, options),
+            'width': width,
+            'height': height,
+        },
+        'srcset': srcset,
+        'sizes': f'(max-width: {layout_width}px) 100vw, {layout_width}px',
+        'sources': [
+            (Image.MIME.get(format_, ''), ', '.join(candidates))
+            for format_, candidates in others
+        ],
+    }
+
+
+def spec_key(geometry, options):
+    return geometry, serialize(options)
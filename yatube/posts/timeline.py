@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора.
+
+    Затем те же ленты обрезаются до TIMELINE_LENGTH, поэтому длина
+    ленты не превышает предела и между запусками rebuild_timelines.
+    Возвращает id подписчиков.
+    """
+    entries = [
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers(post.author_id).iterator()
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if entries:
+        trim_followers(post.author_id)
+    return [entry.user_id for entry in entries]
+
+
+def followers(author_id):
+    """id подписчиков автора."""
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+
+
+def trim_followers(author_id):
+    """Обрезает ленты всех подписчиков автора одним DELETE.
+
+    ROW_NUMBER() нумерует записи каждой ленты в порядке индекса
+    (user, pub_date, post), и удаляются записи с номером больше
+    TIMELINE_LENGTH. Запрос читает ленты подписчиков целиком по
+    индексу, но ни одна запись не проходит через Python.
+    """
+    quote = connection.ops.quote_name
+    table = quote(TimelineEntry._meta.db_table)
+    entry_id, user, post, pub_date = (
+        quote(TimelineEntry._meta.get_field(name).column)
+        for name in ('id', 'user', 'post', 'pub_date')
+    )
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values('user_id')
+    sql, params = followers.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {entry_id} IN ('
+            f'SELECT {entry_id} FROM ('
+            f'SELECT {entry_id}, ROW_NUMBER() OVER ('
+            f'PARTITION BY {user} '
+            f'ORDER BY {pub_date} DESC, {post} DESC) AS position '
+            f'FROM {table} WHERE {user} IN ({sql})'
+            f') ranked WHERE position > %s)',
+            (*params, settings.TIMELINE_LENGTH),
+        )
+
+
+def backfill(user_id, author_id):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    posts = (Post.objects
+             .filter(author_id=author_id)
+             .order_by('-pub_date', '-id')
+             .values_list('id', 'pub_date')[:settings.TIMELINE_LENGTH])
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def trim(user_id):
+    """Обрезает ленту пользователя до TIMELINE_LENGTH записей."""
+    boundary = (TimelineEntry.objects
+                .filter(user_id=user_id)
+                .order_by('-pub_date', '-post_id')
+                .values_list('pub_date', 'post_id')
+                [settings.TIMELINE_LENGTH:settings.TIMELINE_LENGTH + 1])
+    for pub_date, post_id in boundary:
+        TimelineEntry.objects.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lte=post_id),
+            user_id=user_id,
+        ).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя с нуля.
+
+    Записи копируются одним INSERT ... SELECT: до TIMELINE_LENGTH
+    строк не проходят через Python, что при пересборке всех лент
+    в разы быстрее bulk_create.
+    """
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True)
+    posts = (Post.objects
+             .filter(author_id__in=author_ids)
+             .order_by('-pub_date', '-id')
+             .values_list('id', 'pub_date')[:settings.TIMELINE_LENGTH])
+    sql, params = posts.query.sql_with_params()
+    quote = connection.ops.quote_name
+    user, post, pub_date = (
+        quote(TimelineEntry._meta.get_field(name).column)
+        for name in ('user', 'post', 'pub_date')
+    )
+    source = quote('posts')
+    post_id, post_date = (
+        f'{source}.{quote(Post._meta.get_field(name).column)}'
+        for name in ('id', 'pub_date')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+            f'({user}, {post}, {pub_date}) '
+            f'SELECT %s, {post_id}, {post_date} FROM ({sql}) {source}',
+            (user_id, *params),
+        )
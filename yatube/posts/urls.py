@@ -7,6 +7,8 @@ app_name = 'posts'
 urlpatterns = [
     # Главная страница
     path('', views.index, name='index'),
+    # Поиск по постам и комментариям
+    path('search/', views.search, name='search'),
     # Страницы сообществ
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Профайл пользователя
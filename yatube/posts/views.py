@@ -1,41 +1,80 @@
 from typing import Any, Dict
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden
+from django.utils.functional import SimpleLazyObject
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Post, User, Follow
+from . import cache, counters, feeds, thumbnails
 from .forms import PostForm, CommentForm
+from .paginators import (
+    CursorPaginator, MergePaginator, SearchPaginator, TimelinePaginator
+)
 
 
 ITEMS_PER_PAGE: int = 5
 
 
+def get_page_obj(request, posts, paginator_class=CursorPaginator, **kwargs):
+    """Страница ленты по курсору (?cursor=) или номеру (?page=)."""
+    paginator = paginator_class(posts, ITEMS_PER_PAGE, **kwargs)
+    page_obj = paginator.get_page(
+        request.GET.get('page'),
+        cursor=request.GET.get('cursor'),
+    )
+    return page_obj
+
+
+def lazy_page_obj(request, posts, paginator_class=CursorPaginator, **kwargs):
+    """Страница ленты, которая читается из базы при первом обращении.
+
+    Ленты кэшируются фрагментом с ключом из параметров запроса, поэтому
+    при попадании в кэш страница не запрашивается вовсе.
+    """
+    return SimpleLazyObject(
+        lambda: get_page_obj(request, posts, paginator_class, **kwargs)
+    )
+
+
 def index(request):
     """Главная страница."""
-    posts = Post.objects.select_related('author').order_by('-pub_date')
+    posts = feeds.posts().order_by('-pub_date')
     template = 'posts/index.html'
-    paginator = Paginator(posts, ITEMS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = lazy_page_obj(request, posts)
     title: str = 'Последние обновления на сайте'
     context: Dict[str, Any] = {
-        'posts': posts,
+        'feed': 'index',
         'title': title,
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+def search(request):
+    """Полнотекстовый поиск по постам и комментариям."""
+    query = request.GET.get('q', '').strip()
+    posts = feeds.posts()
+    template = 'posts/search.html'
+    page_obj = get_page_obj(request, posts, SearchPaginator, query=query)
+    context: Dict[str, Any] = {
+        'query': query,
+        'title': f'Поиск: {query}' if query else 'Поиск',
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 def group_posts(request, slug):
     """Страница сообщества."""
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').order_by('-pub_date')
+    group = cache.group_by_slug(slug)
+    if group is None:
+        raise Http404(f'Группа {slug} не найдена')
+    posts = feeds.posts(group.posts.all()).order_by('-pub_date')
     template = 'posts/group_list.html'
-    paginator = Paginator(posts, ITEMS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = lazy_page_obj(request, posts)
     context: Dict[str, Any] = {
         'group': group,
         'page_obj': page_obj,
@@ -46,21 +85,21 @@ def group_posts(request, slug):
 def profile(request, username):
     """Страница пользователя с его постами."""
     template = 'posts/profile.html'
-    profile_user = get_object_or_404(User, username=username)
-    posts = (profile_user.posts
-             .select_related('author')
-             .order_by('-pub_date')
-             .filter(author__username=username)
-             )
-    posts_counter = posts.count()
-    paginator = Paginator(posts, ITEMS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    follow = profile_user.following.filter(user=request.user.id).exists()
+    profile_user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = counters.stats_for(profile_user)
+    posts = feeds.posts(profile_user.posts.all()).order_by('-pub_date')
+    posts_counter = stats.posts_count
+    page_obj = get_page_obj(request, posts, count=posts_counter)
+    follow = (
+        request.user.is_authenticated
+        and profile_user.following.filter(user=request.user).exists()
+    )
     context: Dict[str, Any] = {
-        'posts': posts,
         'profile_user': profile_user,
         'posts_counter': posts_counter,
+        'stats': stats,
         'page_obj': page_obj,
         'following': follow,
     }
@@ -70,12 +109,12 @@ def profile(request, username):
 def post_detail(request, post_id):
     """Страница поста."""
     template = 'posts/post_detail.html'
-    post_info = get_object_or_404(Post, pk=post_id)
-    number_of_posts = post_info.author.posts.count()
+    post_info = get_object_or_404(feeds.detail(), pk=post_id)
+    number_of_posts = counters.stats_for(post_info.author).posts_count
     form = CommentForm(
         request.POST or None,
     )
-    comments = Comment.objects.filter(post=post_info)
+    comments = feeds.comments(post_info)
     context: Dict[str, Any] = {
         'post_info': post_info,
         'number_of_posts': number_of_posts,
@@ -100,7 +139,8 @@ def post_create(request):
 
         if form.is_valid():
             form.save(commit=False).author_id = request.user.pk
-            form.save()
+            post = form.save()
+            thumbnails.schedule(post.image.name, post.image_width)
             return redirect('posts:profile', username=request.user)
     else:
         form = PostForm()
@@ -131,6 +171,8 @@ def post_edit(request, post_id):
         )
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post.image.name, post.image_width)
         return redirect('posts:post_detail', post.id)
     context: Dict[str, Any] = {
         'post': post,
@@ -164,24 +206,33 @@ def follow_index(request):
     """
     template = 'posts/follow.html'
     title = 'Избранные посты'
-    follower = Follow.objects.filter(user=request.user).values_list(
-        'author_id', flat=True
-    )
-    posts = (Post.objects
-             .select_related('author')
-             .order_by('-pub_date')
-             .filter(author_id__in=follower))
-    paginator = Paginator(posts, ITEMS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_follow_page_obj(request)
     context: Dict[str, Any] = {
+        'feed': 'follow',
         'page_obj': page_obj,
         'title': title,
-        'follower': follower,
     }
     return render(request, template, context)
 
 
+def get_follow_page_obj(request, engine=None):
+    """Страница ленты подписок движком из settings.FOLLOW_FEED_ENGINE."""
+    engine = engine or settings.FOLLOW_FEED_ENGINE
+    authors = Follow.objects.filter(user=request.user).values('author_id')
+    posts = feeds.posts()
+    if engine == 'timeline':
+        return get_page_obj(
+            request, feeds.timeline(request.user), TimelinePaginator
+        )
+    if engine == 'merge':
+        return get_page_obj(request, posts, MergePaginator, authors=authors)
+    if engine == 'query':
+        return get_page_obj(request, posts.filter(author_id__in=authors))
+    raise ImproperlyConfigured(
+        f'Неизвестный FOLLOW_FEED_ENGINE: {engine!r}'
+    )
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from core.admin import PrefixSearchMixin
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(PrefixSearchMixin, BaseUserAdmin):
+    """Пользователи с поиском по началу username, почты и имени.
+
+    Attributes:
+        search_fields: поля поиска Django по умолчанию; username
+            проиндексирован уникальным индексом, остальные — миграцией
+            users 0001, поэтому поиск и автодополнение не читают всю
+            таблицу.
+    """
+
+    search_fields = ('username', 'first_name', 'last_name', 'email')
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Поля поиска UserAdmin. Модель пользователя принадлежит django.contrib.auth,
+# поэтому индексы создаются SQL, а не через Meta.indexes.
+FIELDS = ('email', 'first_name', 'last_name')
+
+SQL = [
+    f'CREATE INDEX IF NOT EXISTS auth_user_{field}_idx ON auth_user ({field})'
+    for field in FIELDS
+]
+
+REVERSE_SQL = [
+    f'DROP INDEX IF EXISTS auth_user_{field}_idx' for field in FIELDS
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SQL, REVERSE_SQL),
+    ]
@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,7 +12,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'l^p97_$*oxli^g-*p%+htbi)q=e223a0v^0uuo^vb!73t)7-43'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.nplusone.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -136,13 +138,109 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для всех воркеров хоста кэш в файле SQLite (WAL, LRU, TTL)
+# default: LRU в памяти воркера поверх общего для воркеров SQLite (shared)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.tiered.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'MAX_ENTRIES': 5000,
+            'L1_TIMEOUT': 30,
+            'POLL_INTERVAL': 0.5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
 
+# Лента подписок: максимальная длина и размер пакета при записи
+TIMELINE_LENGTH = 1000
+
+TIMELINE_BATCH_SIZE = 500
+
+# Движок ленты подписок: 'timeline' (fan-out on write),
+# 'merge' (слияние потоков авторов) или 'query' (author_id__in).
+# 'merge' в bench_follow_feed проигрывает 'query' на всех размерах.
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Миниатюры, которые выводят шаблоны: создаются заранее пулом процессов
+THUMBNAIL_GEOMETRIES = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+THUMBNAIL_WORKERS = 2
+
+# Одну миниатюру строит один процесс: срок аренды и сколько секунд
+# остальные ждут готовой миниатюры
+THUMBNAIL_LEASE_TIMEOUT = 30
+
+THUMBNAIL_LEASE_WAIT = 5.0
+
+# Уменьшенные копии для /resize/: каталог, предельный объём и
+# срок кэширования в браузере. Копию могут пересоздать под тем же
+# адресом, поэтому срок короткий, а дальше браузер сверяет ETag.
+RESIZE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'resize')
+
+RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+RESIZE_MAX_AGE = 24 * 3600
+
+# JPEG декодируется сразу в уменьшенном масштабе (Image.draft)
+THUMBNAIL_ENGINE = 'core.thumbnail.engines.DraftEngine'
+
+# Варианты миниатюр для srcset: ширины и форматы в порядке
+# предпочтения (последний — для <img>, остальные — в <source>)
+THUMBNAIL_VARIANT_WIDTHS = (320, 640, 960, 1920)
+
+THUMBNAIL_VARIANT_FORMATS = ('WEBP', 'JPEG')
+
+# Обработка загруженных картинок: длинная сторона, качество JPEG и
+# сохранение исходников в MEDIA_ROOT/originals
+IMAGE_MAX_EDGE = 2048
+
+IMAGE_JPEG_QUALITY = 82
+
+IMAGE_KEEP_ORIGINALS = False
+
+# Что делать, если шаблон вычислил queryset постов без среза:
+# 'log', 'raise' или None (не проверять)
+TEMPLATE_QUERYSET_GUARD = None
+
+# Поиск N+1 запросов: 'log', 'raise' или None (не искать); сколько
+# одинаковых запросов из одного места считать N+1 и какую долю
+# страниц проверять
+NPLUSONE_MODE = 'log'
+
+NPLUSONE_THRESHOLD = 3
+
+NPLUSONE_SAMPLE_RATE = 0.01
+
+# Прогон тестов (manage.py test или pytest). Тесты очищают кэш, поэтому
+# получают свой кэш в памяти процесса и не трогают общий кэш на диске,
+# которым пользуются сервер разработки и параллельные прогоны.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# YATUBE_LOCMEM_CACHE=1 заменяет кэши выше кэшем в памяти одного
+# процесса и вне тестов: например, когда каталог cache недоступен
+# для записи.
+if TESTING or os.environ.get('YATUBE_LOCMEM_CACHE') == '1':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 if DEBUG:
+    TEMPLATE_QUERYSET_GUARD = 'log'
+    # В разработке и тестах N+1 роняет страницу, а не пишется в лог.
+    NPLUSONE_MODE = 'raise'
+    NPLUSONE_SAMPLE_RATE = 1.0
     MIDDLEWARE += [
         'debug_toolbar.middleware.DebugToolbarMiddleware',
     ]